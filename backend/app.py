@@ -1,11 +1,25 @@
 import os
-from flask import Flask, jsonify, send_from_directory
+import mimetypes
+from flask import Flask, jsonify, send_from_directory, make_response, abort
+from werkzeug.security import safe_join
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from modelsdb import db
 from config import Config
 from dotenv import load_dotenv
 from routesapi import auth_bp, users_bp, properties_bp, leads_bp, communications_bp
+from utils.counters import counter_buffer
+from utils.image_pipeline import image_pipeline
+from utils.image_storage import upload_sweeper
+from utils.lead_alerts import listing_alerts
+from utils.lead_stats import rebuild_lead_stats, backfill_lead_stats
+from utils.lead_dedup import deduplicate_leads
+from utils.geo_backfill import ensure_geohash_column, backfill_property_geohashes
+from utils.schema_upgrade import upgrade_schema
+from utils.lead_scoring import lead_scorer
+from utils.lead_assignment import lead_assigner
+from utils.clusters import cluster_index
+from utils.matching import property_inventory
 from sqlalchemy import text
 
 load_dotenv()
@@ -17,7 +31,7 @@ def create_app():
     CORS(app, resources={
         r"/api/*": {
             "origins": ["http://localhost:5173", "http://localhost:5174", "http://localhost:5175", "http://localhost:5176"],
-            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization", "Accept"],
             "supports_credentials": True
         }
@@ -26,6 +40,29 @@ def create_app():
     # Configure database
     app.config.from_object(Config)
     db.init_app(app)
+
+    # Start the write-behind flusher for property view/favorite counts
+    counter_buffer.init_app(app)
+
+    # Start the worker pool that post-processes uploaded images
+    image_pipeline.init_app(app)
+
+    # Retry upload deletions held back by the grace period
+    upload_sweeper.init_app(app)
+
+    # Start the worker that tells matching leads about new listings
+    listing_alerts.init_app(app)
+
+    # Start the thread that keeps lead priority scores current
+    lead_scorer.init_app(app)
+
+    # Agent load counts for lead routing are reloaded on this interval
+    lead_assigner.init_app(app)
+
+    # Map clusters and the lead matching inventory recheck the properties
+    # version on this interval
+    cluster_index.init_app(app)
+    property_inventory.init_app(app)
     
     # Configure JWT
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "dev-secret-key")
@@ -38,15 +75,63 @@ def create_app():
     app.register_blueprint(leads_bp)
     app.register_blueprint(communications_bp)
 
+    @app.cli.command("upgrade-db")
+    def upgrade_db_command():
+        """Add columns and indexes missing from tables created by older versions"""
+        db.create_all()
+        upgrade_schema()
+        print("Database schema is up to date")
+
+    @app.cli.command("backfill-geohashes")
+    def backfill_geohashes_command():
+        """Add properties.geohash if missing and fill it for existing rows"""
+        ensure_geohash_column()
+        print(f"Geohashed {backfill_property_geohashes()} properties")
+
+    @app.cli.command("rebuild-lead-stats")
+    def rebuild_lead_stats_command():
+        """Recount the lead funnel aggregates from the leads table"""
+        rebuild_lead_stats()
+
+    @app.cli.command("dedup-leads")
+    def dedup_leads_command():
+        """Merge duplicate open leads across the whole table"""
+        summary = deduplicate_leads()
+        print(f"Merged {summary['merged']} duplicate leads in {len(summary['groups'])} groups")
+
+    @app.cli.command("score-leads")
+    def score_leads_command():
+        """Recompute the priority score of every open lead"""
+        print(f"Scored {lead_scorer.rescore_all()} open leads")
+
     @app.route("/")
     def home():
         return jsonify({"message": "Welcome to AURA Real Estate API"})
 
     # Serve uploaded files
+    upload_dir = app.config["UPLOAD_FOLDER"]
+    if app.config["UPLOADS_OFFLOAD"] == "x-sendfile":
+        app.config["USE_X_SENDFILE"] = True
+
     @app.route("/uploads/<filename>")
     def uploaded_file(filename):
-        upload_dir = os.path.join(os.getcwd(), 'uploads')
-        return send_from_directory(upload_dir, filename)
+        if app.config["UPLOADS_OFFLOAD"] == "x-accel":
+            # nginx streams the file from its internal location; only headers go through Python
+            path = safe_join(upload_dir, filename)
+            if path is None or not os.path.isfile(path):
+                abort(404)
+            response = make_response("")
+            response.headers["X-Accel-Redirect"] = app.config["UPLOADS_ACCEL_PREFIX"] + filename
+            response.headers["Content-Type"] = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        else:
+            # Conditional (ETag/Last-Modified) and Range requests are handled by
+            # send_file, and the file goes out through wsgi.file_wrapper so
+            # servers such as gunicorn can use sendfile()
+            response = send_from_directory(
+                upload_dir, filename, max_age=app.config["UPLOADS_MAX_AGE"], conditional=True, etag=True
+            )
+        response.headers["Cache-Control"] = f"public, max-age={app.config['UPLOADS_MAX_AGE']}, immutable"
+        return response
 
     return app
 
@@ -56,6 +141,9 @@ if __name__ == "__main__":
     # Create tables if they don't exist
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+        backfill_property_geohashes()
+        backfill_lead_stats()
         print("Database tables checked and created if needed!")
     
     app.run(debug=True, port=5000)
@@ -7,3 +7,45 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
+
+    # In-process cache of serialized property responses
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "60"))  # seconds
+
+    # How often buffered view/favorite counts are written to the database
+    COUNTER_FLUSH_INTERVAL = float(os.getenv("COUNTER_FLUSH_INTERVAL", "5"))  # seconds
+
+    # Background workers that build thumbnails/WebP variants of uploads
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+    # Background workers that notify open leads about matching new listings
+    LEAD_ALERT_WORKERS = int(os.getenv("LEAD_ALERT_WORKERS", "1"))
+
+    # Lead priority scores: leads touched by events are rescored every
+    # flush interval, and every open lead once per full interval
+    LEAD_SCORE_FLUSH_INTERVAL = float(os.getenv("LEAD_SCORE_FLUSH_INTERVAL", "10"))  # seconds
+    LEAD_SCORE_FULL_INTERVAL = float(os.getenv("LEAD_SCORE_FULL_INTERVAL", "3600"))  # seconds
+
+    # How often a background thread reloads the per-agent open lead counts
+    # (other workers' commits are only seen on reload)
+    LEAD_ASSIGNMENT_RELOAD_INTERVAL = float(os.getenv("LEAD_ASSIGNMENT_RELOAD_INTERVAL", "60"))  # seconds
+
+    # In-process property caches (map clusters, lead matching inventory)
+    # follow this worker's writes and reload other workers' ones once the
+    # properties version has moved, checking it at most this often
+    PROPERTY_CACHE_RELOAD_INTERVAL = float(os.getenv("PROPERTY_CACHE_RELOAD_INTERVAL", "60"))  # seconds
+
+    # Uploaded images; resolved once instead of per request
+    UPLOAD_FOLDER = os.path.abspath(os.getenv("UPLOAD_FOLDER", os.path.join(os.getcwd(), "uploads")))
+    # Unreferenced uploads younger than this are not deleted yet (a request
+    # reusing the same content may not have committed); the sweeper retries
+    UPLOAD_DELETE_GRACE = float(os.getenv("UPLOAD_DELETE_GRACE", "600"))  # seconds
+    UPLOAD_SWEEP_INTERVAL = float(os.getenv("UPLOAD_SWEEP_INTERVAL", "300"))  # seconds
+    # Upload names never change content (they are content hashes), so browsers
+    # and CDNs may keep them for a year
+    UPLOADS_MAX_AGE = int(os.getenv("UPLOADS_MAX_AGE", str(365 * 24 * 3600)))
+    # "" to stream files from Python, "x-sendfile" (Apache/lighttpd) or
+    # "x-accel" (nginx) to let the front server send the bytes
+    UPLOADS_OFFLOAD = os.getenv("UPLOADS_OFFLOAD", "")
+    # nginx internal location that maps onto UPLOAD_FOLDER, for x-accel
+    UPLOADS_ACCEL_PREFIX = os.getenv("UPLOADS_ACCEL_PREFIX", "/protected-uploads/")
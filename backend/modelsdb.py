@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, DDL
 from datetime import datetime
 from enum import Enum as PyEnum
+from utils.geo import encode_geohash
 
 db = SQLAlchemy()
 
@@ -31,6 +33,9 @@ class LeadStatus(PyEnum):
     CONVERTED = 'converted'
     LOST = 'lost'
 
+# Leads an agent is still working
+OPEN_LEAD_STATUSES = (LeadStatus.NEW, LeadStatus.CONTACTED, LeadStatus.IN_PROGRESS, LeadStatus.QUALIFIED)
+
     # User Model
 class User(db.Model):
     __tablename__ = 'users'
@@ -110,6 +115,16 @@ class User(db.Model):
 # Property Model
 class Property(db.Model):
     __tablename__ = "properties"
+    __table_args__ = (
+        # Keyset pagination seeks on (created_at, id)
+        db.Index("ix_properties_created_at_id", "created_at", "id"),
+        # Search filters: equality columns first, then the price range
+        db.Index("ix_properties_status_created_at_id", "status", "created_at", "id"),
+        db.Index("ix_properties_city_status_price", "city", "status", "price"),
+        db.Index("ix_properties_state_city", "state", "city"),
+        db.Index("ix_properties_type_status_price", "property_type", "status", "price"),
+        db.Index("ix_properties_featured_created_at", "is_featured", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -124,6 +139,7 @@ class Property(db.Model):
     zip_code = db.Column(db.String(20), nullable=False)
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12), index=True)  # Kept in sync with latitude/longitude
     
     # Property details
     bedrooms = db.Column(db.Integer)
@@ -153,7 +169,9 @@ class Property(db.Model):
     favorited_by = db.relationship('User', secondary='favorites',
                                  backref=db.backref('favorite_properties', lazy='dynamic'))
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        if fields is not None:
+            return {field: self._field_value(field) for field in fields}
         return {
             "id": self.id,
             "title": self.title,
@@ -184,13 +202,56 @@ class Property(db.Model):
             "updated_at": self.updated_at.isoformat()
         }
 
+    def _field_value(self, field):
+        """Serialize a single to_dict key without touching other columns"""
+        if field == "property_type":
+            return self.property_type.value
+        if field == "images":
+            return [img.to_dict() for img in self.images]
+        if field in ("created_at", "updated_at"):
+            return getattr(self, field).isoformat()
+        return getattr(self, field)
+
+@event.listens_for(Property, "before_insert")
+@event.listens_for(Property, "before_update")
+def sync_property_geohash(mapper, connection, target):
+    """Recompute the spatial index key whenever a property is written"""
+    if target.latitude is None or target.longitude is None:
+        target.geohash = None
+    else:
+        target.geohash = encode_geohash(float(target.latitude), float(target.longitude))
+
+# Weighted full-text document for a property. Queries must use this exact
+# expression for Postgres to pick up the GIN index created below.
+PROPERTY_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(address, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(features, '') || ' ' || coalesce(amenities, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+PROPERTY_SEARCH_INDEX = (
+    "CREATE INDEX IF NOT EXISTS ix_properties_search ON properties "
+    f"USING GIN (({PROPERTY_SEARCH_VECTOR}))"
+)
+
+event.listen(
+    Property.__table__,
+    "after_create",
+    DDL(PROPERTY_SEARCH_INDEX).execute_if(dialect="postgresql")
+)
+
 
 class PropertyImage(db.Model):
     __tablename__ = "property_images"
 
     id = db.Column(db.Integer, primary_key=True)
-    property_id = db.Column(db.Integer, db.ForeignKey("properties.id"), nullable=False)
-    image_url = db.Column(db.String(255), nullable=False)
+    property_id = db.Column(db.Integer, db.ForeignKey("properties.id"), nullable=False, index=True)
+    image_url = db.Column(db.String(255), nullable=False, index=True)  # Content-addressed, shared across listings
+    # Filled in by the background image pipeline
+    webp_url = db.Column(db.String(255))
+    thumbnail_url = db.Column(db.String(255))
+    processing_status = db.Column(db.String(20), default='pending')  # pending, ready, skipped, failed
     caption = db.Column(db.String(200))
     is_primary = db.Column(db.Boolean, default=False)
     order = db.Column(db.Integer, default=0)  # For ordering in carousel
@@ -201,15 +262,52 @@ class PropertyImage(db.Model):
             "id": self.id,
             "property_id": self.property_id,
             "image_url": self.image_url,
+            "webp_url": self.webp_url,
+            "thumbnail_url": self.thumbnail_url,
+            "processing_status": self.processing_status,
             "caption": self.caption,
             "is_primary": self.is_primary,
             "order": self.order,
             "created_at": self.created_at.isoformat()
         }
 
+# Write counter per table, bumped in a short transaction right after every
+# committed write to it (utils.table_versions); list validators read this one
+# row instead of scanning the table
+class TableVersion(db.Model):
+    __tablename__ = "table_versions"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Last run of periodic jobs that must run in one process at a time; workers
+# claim a run by advancing last_run_at (utils.lead_scoring)
+class ScheduledRun(db.Model):
+    __tablename__ = "scheduled_runs"
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_run_at = db.Column(db.DateTime)
+
 # Lead Model
 class Lead(db.Model):
     __tablename__ = "leads"
+    __table_args__ = (
+        # New-listing alerts look up open leads by budget
+        db.Index("ix_leads_status_budget", "status", "budget_min", "budget_max"),
+        # Pipeline pages: equality filters first, then the (created_at, id) keyset
+        db.Index("ix_leads_agent_status_created_at", "assigned_agent_id", "status", "created_at", "id"),
+        db.Index("ix_leads_user_created_at", "user_id", "created_at", "id"),
+        db.Index("ix_leads_status_created_at", "status", "created_at", "id"),
+        db.Index("ix_leads_property_created_at", "property_id", "created_at", "id"),
+        db.Index("ix_leads_created_at_id", "created_at", "id"),
+        # Duplicate detection blocks candidates by client and property/location
+        db.Index("ix_leads_user_property", "user_id", "property_id"),
+        db.Index("ix_leads_user_location_key", "user_id", "location_key"),
+        # Agent queues sorted by priority
+        db.Index("ix_leads_agent_priority", "assigned_agent_id", "priority_score", "id"),
+        db.Index("ix_leads_priority", "priority_score", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     status = db.Column(db.Enum(LeadStatus), default=LeadStatus.NEW)
@@ -230,10 +328,13 @@ class Lead(db.Model):
     desired_property_type = db.Column(db.String(500))
     desired_bedrooms = db.Column(db.Integer)
     desired_bathrooms = db.Column(db.Integer)
+    location_key = db.Column(db.String(500))  # Normalized desired_location, kept in sync below
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_contacted = db.Column(db.DateTime)
+    status_changed_at = db.Column(db.DateTime, default=datetime.utcnow)  # When the lead entered its current status
+    priority_score = db.Column(db.Float, nullable=False, default=0)  # 0-100, maintained by utils.lead_scoring
 
     # Relationships
     interactions = db.relationship("LeadInteraction", backref="lead", lazy=True)
@@ -258,14 +359,45 @@ class Lead(db.Model):
             "desired_bathrooms": self.desired_bathrooms,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
-            "last_contacted": self.last_contacted.isoformat() if self.last_contacted else None
+            "last_contacted": self.last_contacted.isoformat() if self.last_contacted else None,
+            "status_changed_at": self.status_changed_at.isoformat() if self.status_changed_at else None,
+            "priority_score": self.priority_score
         }
 
+def normalize_location(location):
+    """Order-insensitive, case-insensitive form of a comma separated location"""
+    terms = sorted({term.strip().lower() for term in (location or "").split(",") if term.strip()})
+    return ",".join(terms)[:500] or None
+
+@event.listens_for(Lead, "before_insert")
+@event.listens_for(Lead, "before_update")
+def sync_lead_location_key(mapper, connection, target):
+    """Recompute the duplicate-detection key whenever a lead is written"""
+    target.location_key = normalize_location(target.desired_location)
+
+# Lead counts per status, overall ("all"), per agent and per source; kept
+# up to date by utils.lead_stats so dashboards never scan the leads table
+class LeadFunnelCount(db.Model):
+    __tablename__ = "lead_funnel_counts"
+
+    dimension = db.Column(db.String(20), primary_key=True)  # all, agent, source
+    dimension_value = db.Column(db.String(100), primary_key=True)  # agent id or source; "" for none
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+# Total time leads spent in a status before moving on
+class LeadStageDuration(db.Model):
+    __tablename__ = "lead_stage_durations"
+
+    status = db.Column(db.String(20), primary_key=True)
+    total_seconds = db.Column(db.Float, nullable=False, default=0)
+    exits = db.Column(db.Integer, nullable=False, default=0)
+
 class LeadInteraction(db.Model):
     __tablename__ = "lead_interactions"
 
     id = db.Column(db.Integer, primary_key=True)
-    lead_id = db.Column(db.Integer, db.ForeignKey("leads.id"), nullable=False)
+    lead_id = db.Column(db.Integer, db.ForeignKey("leads.id"), nullable=False, index=True)
     agent_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     interaction_type = db.Column(db.String(50), nullable=False)  # call, email, meeting, etc.
     notes = db.Column(db.Text)
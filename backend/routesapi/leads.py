@@ -1,7 +1,15 @@
 from flask import Blueprint, request
-from modelsdb import db, Lead, User, LeadStatus
+from sqlalchemy.orm import selectinload
+from modelsdb import db, Lead, User, LeadStatus, Property
 from utils.responses import success_response, error_response
 from utils.validation import validate_lead_data
+from utils.pagination import parse_limit, paginate_keyset, paginate_by_score
+from utils.lead_search import parse_lead_filters, apply_lead_filters
+from utils.lead_stats import lead_funnel_stats
+from utils.lead_bulk import parse_bulk_request, bulk_update_leads
+from utils.lead_dedup import find_duplicate, merge_lead_fields, deduplicate_leads
+from utils.matching import property_inventory
+from utils.lead_assignment import lead_assigner
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 leads_bp = Blueprint("leads", __name__, url_prefix="/api/leads")
@@ -40,6 +48,17 @@ def create_lead():
             desired_bathrooms=data.get("desired_bathrooms")
         )
 
+        # A repeat of an open request updates that lead instead of adding another
+        duplicate = find_duplicate(lead)
+        if duplicate is not None:
+            merge_lead_fields(duplicate, lead)
+            db.session.commit()
+            return success_response(duplicate.to_dict(), f"Lead merged into existing lead {duplicate.id}")
+
+        # Route unassigned leads to the least loaded agent covering the area
+        if lead.assigned_agent_id is None:
+            lead.assigned_agent_id = lead_assigner.pick_agent(lead.desired_location, lead.desired_property_type)
+
         db.session.add(lead)
         db.session.commit()
 
@@ -48,19 +67,79 @@ def create_lead():
         db.session.rollback()
         return error_response("Database Error", str(e), 500)
 
-# Get all leads
+# Get leads one page at a time, newest first or by priority score
 @leads_bp.route("/", methods=["GET"])
 @jwt_required()
 def get_leads():
     try:
         identity = get_jwt_identity()
+        limit = parse_limit(request.args.get("limit"))
+        filters = parse_lead_filters(request.args, identity)
+
+        query = apply_lead_filters(Lead.query, filters)
         if identity["user_type"] == "client":
             # Clients can only see leads they created
-            leads = Lead.query.filter_by(user_id=identity["id"]).all()
+            query = query.filter(Lead.user_id == identity["id"])
+
+        sort = request.args.get("sort", "newest")
+        if sort == "priority":
+            # Highest priority first, from the precomputed score
+            leads, next_cursor = paginate_by_score(query, Lead, Lead.priority_score, limit, request.args.get("cursor"))
+        elif sort == "newest":
+            leads, next_cursor = paginate_keyset(query, Lead, limit, request.args.get("cursor"))
         else:
-            # Agents and admins can see all leads
-            leads = Lead.query.all()
-        return success_response([l.to_dict() for l in leads], "Leads retrieved successfully")
+            raise ValueError("Sort must be newest or priority")
+        return success_response(
+            [l.to_dict() for l in leads],
+            "Leads retrieved successfully",
+            next_cursor=next_cursor
+        )
+    except ValueError as e:
+        return error_response("Bad Request", str(e), 400)
+    except Exception as e:
+        return error_response("Database Error", str(e), 500)
+
+# Apply one change set to many leads, chosen by ids or a filter (only agent/admin)
+@leads_bp.route("/", methods=["PATCH"])
+@jwt_required()
+def bulk_update():
+    identity = get_jwt_identity()
+    if identity["user_type"] == "client":
+        return error_response("Forbidden", "Only agents and admins can bulk update leads", 403)
+
+    try:
+        ids, filters, changes = parse_bulk_request(request.get_json(silent=True), identity)
+        summary = bulk_update_leads(ids, filters, changes)
+        return success_response(summary, f"{summary['updated']} leads updated successfully")
+    except ValueError as e:
+        return error_response("Bad Request", str(e), 400)
+    except Exception as e:
+        return error_response("Database Error", str(e), 500)
+
+# Merge duplicate open leads across the backlog (only admin)
+@leads_bp.route("/dedup", methods=["POST"])
+@jwt_required()
+def dedup_leads():
+    identity = get_jwt_identity()
+    if identity["user_type"] != "admin":
+        return error_response("Forbidden", "Only admins can merge duplicate leads", 403)
+
+    try:
+        data = request.get_json(silent=True) or {}
+        summary = deduplicate_leads(dry_run=bool(data.get("dry_run")))
+        return success_response(summary, f"{summary['merged']} duplicate leads merged")
+    except Exception as e:
+        return error_response("Database Error", str(e), 500)
+
+# Funnel counts, conversion rates and time in stage (only agent/admin)
+@leads_bp.route("/stats", methods=["GET"])
+@jwt_required()
+def get_lead_stats():
+    try:
+        identity = get_jwt_identity()
+        if identity["user_type"] == "client":
+            return error_response("Forbidden", "Only agents and admins can view lead statistics", 403)
+        return success_response(lead_funnel_stats(), "Lead statistics retrieved successfully")
     except Exception as e:
         return error_response("Database Error", str(e), 500)
 
@@ -81,6 +160,37 @@ def get_lead(id):
     except Exception as e:
         return error_response("Database Error", str(e), 500)
 
+# Get the listings that best match a lead's requirements
+@leads_bp.route("/<int:id>/matches", methods=["GET"])
+@jwt_required()
+def get_lead_matches(id):
+    try:
+        identity = get_jwt_identity()
+        lead = Lead.query.get(id)
+        if not lead:
+            return error_response("Not Found", f"Lead {id} not found", 404)
+
+        if identity["user_type"] == "client" and lead.user_id != identity["id"]:
+            return error_response("Forbidden", "You can only view your own leads", 403)
+
+        limit = parse_limit(request.args.get("limit"), default=10)
+        matches = property_inventory.top_matches(lead, limit)
+        scores = dict(matches)
+        properties = Property.query.options(selectinload(Property.images)) \
+            .filter(Property.id.in_(list(scores))).all() if scores else []
+        properties.sort(key=lambda p: -scores[p.id])
+
+        data = []
+        for p in properties:
+            item = p.to_dict()
+            item["match_score"] = round(scores[p.id], 4)
+            data.append(item)
+        return success_response(data, "Matches retrieved successfully")
+    except ValueError as e:
+        return error_response("Bad Request", str(e), 400)
+    except Exception as e:
+        return error_response("Database Error", str(e), 500)
+
 # Update a lead
 @leads_bp.route("/<int:id>", methods=["PUT"])
 @jwt_required()
@@ -1,40 +1,36 @@
-import os
-import uuid
-from werkzeug.utils import secure_filename
-from flask import Blueprint, request, current_app
-from modelsdb import db, Property, PropertyType, PropertyImage
+from werkzeug.exceptions import RequestEntityTooLarge
+from flask import Blueprint, request, current_app, Response, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from modelsdb import db, Property, PropertyType, PropertyImage, Favorite
 from utils.responses import success_response, error_response
-from utils.validation import validate_property_data
+from utils.validation import validate_property_data, normalize_property_data
+from utils.pagination import parse_limit, paginate_keyset
+from utils.property_search import parse_property_filters, apply_property_filters
+from utils.geo import bbox_around, bbox_clause, haversine_km, parse_bbox
+from utils.clusters import cluster_index, MAX_CLUSTER_ZOOM
+from utils.search_index import search_properties
+from utils.facets import property_facets
+from utils.http_cache import make_etag, is_not_modified, not_modified_response, with_cache_headers
+from utils.counters import counter_buffer
+from utils.table_versions import current_version, PROPERTIES
+from utils.image_pipeline import image_pipeline
+from utils.lead_alerts import listing_alerts
+from utils.image_storage import release_unreferenced
+from utils.uploads import parse_image_upload
+from utils.property_import import read_import_rows, import_properties
+from utils.export import iter_ndjson, iter_csv, EXPORT_FORMATS, EXPORT_BATCH_SIZE
+from utils.fieldsets import parse_fields, property_load_options
+from utils.response_cache import response_cache, store_response, replay_response, property_tag, LIST_TAG
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 properties_bp = Blueprint("properties", __name__, url_prefix="/api/properties")
 
-# Helper functions for file handling
+# File upload limits
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def save_uploaded_file(file):
-    """Save uploaded file and return the file path"""
-    if file and allowed_file(file.filename):
-        # Create unique filename
-        filename = secure_filename(file.filename)
-        name, ext = os.path.splitext(filename)
-        unique_filename = f"{name}_{uuid.uuid4().hex[:8]}{ext}"
-        
-        # Ensure uploads directory exists
-        upload_dir = os.path.join(os.getcwd(), 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(upload_dir, unique_filename)
-        file.save(file_path)
-        
-        # Return relative path for URL
-        return f"/uploads/{unique_filename}"
-    return None
+MAX_IMAGES_PER_PROPERTY = 10
+MAX_RADIUS_KM = 500
 
 # Create a property (only agent/admin)
 @properties_bp.route("/", methods=["POST"])
@@ -46,36 +42,34 @@ def create_property():
 
     # Handle both JSON and FormData requests
     if request.content_type and 'multipart/form-data' in request.content_type:
-        # FormData request (with files)
-        data = request.form.to_dict()
-        files = request.files.getlist('images')
+        # FormData request (with files): images are streamed to disk while
+        # the body is parsed, and oversized ones are rejected mid-stream
+        try:
+            data, uploads = parse_image_upload(
+                request, 'images', ALLOWED_EXTENSIONS, MAX_IMAGES_PER_PROPERTY, MAX_FILE_SIZE
+            )
+        except RequestEntityTooLarge as e:
+            return error_response("File too large", e.description, 413)
     else:
         # JSON request (no files)
         data = request.get_json()
-        files = []
-    
-    # Convert string values to appropriate types for numeric fields
-    numeric_fields = ['price', 'latitude', 'longitude', 'bedrooms', 'bathrooms', 
-                     'square_feet', 'lot_size', 'year_built', 'parking_spaces']
-    for field in numeric_fields:
-        if field in data and data[field]:
-            try:
-                if field in ['bedrooms', 'year_built', 'parking_spaces']:
-                    data[field] = int(data[field])
-                else:
-                    data[field] = float(data[field])
-            except (ValueError, TypeError):
-                data[field] = None
+        uploads = []
     
-    # Convert boolean fields
-    if 'is_featured' in data:
-        data['is_featured'] = data['is_featured'].lower() == 'true' if isinstance(data['is_featured'], str) else bool(data['is_featured'])
+    # Convert form strings to numbers and booleans
+    data = normalize_property_data(data)
     
     # Validate property data
     is_valid, errors = validate_property_data(data)
     if not is_valid:
+        for upload in uploads:
+            upload.discard()
         return error_response("Validation failed", "Invalid property data", 400, {"validation_errors": errors})
     
+    # Move the streamed uploads to their content-addressed names before
+    # opening the transaction; metadata stripping and resizing happen later
+    # in the image pipeline
+    image_urls = [upload.commit() for upload in uploads]
+    
     try:
         # Create property
         property = Property(
@@ -104,53 +98,262 @@ def create_property():
         db.session.add(property)
         db.session.flush()  # Get the property ID
         
-        # Handle file uploads
-        if files:
-            for i, file in enumerate(files):
-                if file and file.filename:
-                    # Check file size
-                    file.seek(0, os.SEEK_END)
-                    file_size = file.tell()
-                    file.seek(0)
-                    
-                    if file_size > MAX_FILE_SIZE:
-                        return error_response("File too large", f"File {file.filename} exceeds 5MB limit", 400)
-                    
-                    # Save file
-                    file_path = save_uploaded_file(file)
-                    if file_path:
-                        property_image = PropertyImage(
-                            property_id=property.id,
-                            image_url=file_path,
-                            is_primary=(i == 0),  # First image is primary
-                            order=i
-                        )
-                        db.session.add(property_image)
+        images = []
+        for i, file_path in enumerate(image_urls):
+            property_image = PropertyImage(
+                property_id=property.id,
+                image_url=file_path,
+                is_primary=(i == 0),  # First image is primary
+                order=i
+            )
+            db.session.add(property_image)
+            images.append(property_image)
         
         db.session.commit()
+        
+        # Workers update each image row with its variants when done
+        for property_image in images:
+            image_pipeline.submit(property_image.id)
+
+        # Matching open leads are notified in the background
+        listing_alerts.submit(property.id)
+        
         return success_response(property.to_dict(), "Property created successfully")
     except Exception as e:
         db.session.rollback()
+        release_unreferenced(image_urls)
         return error_response("Database Error", str(e), 500)
 
-# Get all properties (everyone can view)
+# Bulk import properties from a JSON array or CSV file (only agent/admin)
+@properties_bp.route("/import", methods=["POST"])
+@jwt_required()
+def bulk_import_properties():
+    identity = get_jwt_identity()
+    if identity["user_type"] not in ["agent", "admin"]:
+        return error_response("Forbidden", "Only agents can import properties", 403)
+
+    try:
+        rows = read_import_rows(request)
+    except (ValueError, UnicodeDecodeError) as e:
+        return error_response("Bad Request", str(e), 400)
+
+    summary = import_properties(rows, identity["id"])
+    status_code = 201 if summary["created"] else 200
+    return success_response(summary, f"Imported {summary['created']} of {summary['total']} properties", status_code)
+
+# Search properties, one page at a time (everyone can view)
 @properties_bp.route("/", methods=["GET"])
 def get_properties():
     try:
-        properties = Property.query.all()
-        return success_response([p.to_dict() for p in properties], "Properties retrieved successfully")
+        cached = response_cache.get(request.full_path)
+        if cached:
+            if is_not_modified(cached[1], cached[2]):
+                return not_modified_response(cached[1], cached[2])
+            return replay_response(cached)
+
+        limit = parse_limit(request.args.get("limit"))
+        filters = parse_property_filters(request.args)
+        fields = parse_fields(request.args)
+        # Load only the requested columns; images for the whole page come in
+        # one extra IN query
+        query = apply_property_filters(
+            Property.query.options(*property_load_options(fields)), filters
+        )
+        q = request.args.get("q", "").strip()
+
+        # Validators come from the properties write counter (one row read):
+        # any property or image write changes them, whatever the filters
+        version, last_modified = current_version(PROPERTIES)
+        etag = make_etag("properties", request.query_string.decode("utf-8"), version)
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        if q:
+            properties, next_cursor = search_properties(query, q, limit, request.args.get("cursor"))
+        else:
+            properties, next_cursor = paginate_keyset(
+                query, Property, limit, request.args.get("cursor")
+            )
+
+        extra = {"next_cursor": next_cursor}
+        if request.args.get("facets", "").lower() in ("true", "1"):
+            extra["facets"] = property_facets(filters, q)
+        return store_response(request.full_path, with_cache_headers(success_response(
+            [p.to_dict(fields) for p in properties],
+            "Properties retrieved successfully",
+            **extra
+        ), etag, last_modified), [LIST_TAG])
+    except ValueError as e:
+        return error_response("Bad Request", str(e), 400)
+    except Exception as e:
+        return error_response("Database Error", str(e), 500)
+
+# Get properties within radius_km of a point, nearest first (everyone can view)
+@properties_bp.route("/near", methods=["GET"])
+def get_nearby_properties():
+    try:
+        lat = float(request.args["lat"])
+        lng = float(request.args["lng"])
+        radius_km = float(request.args.get("radius_km", 10))
+    except (KeyError, ValueError, TypeError):
+        return error_response("Bad Request", "lat, lng and radius_km must be valid numbers", 400)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return error_response("Bad Request", "Coordinates are out of range", 400)
+    if radius_km <= 0 or radius_km > MAX_RADIUS_KM:
+        return error_response("Bad Request", f"Radius must be between 0 and {MAX_RADIUS_KM} km", 400)
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        filters = parse_property_filters(request.args)
+        filters.pop("bbox", None)
+        fields = parse_fields(request.args)
+
+        # Rank candidates from the geohash cells around the circle using only
+        # their coordinates, then load full rows for the nearest ones
+        query = apply_property_filters(
+            db.session.query(Property.id, Property.latitude, Property.longitude), filters
+        ).filter(bbox_clause(Property, bbox_around(lat, lng, radius_km)))
+        distances = {}
+        for property_id, p_lat, p_lng in query:
+            distance = haversine_km(lat, lng, p_lat, p_lng)
+            if distance <= radius_km:
+                distances[property_id] = distance
+        nearest = sorted(distances, key=distances.get)[:limit]
+
+        properties = Property.query.options(*property_load_options(fields)) \
+            .filter(Property.id.in_(nearest)).all() if nearest else []
+        properties.sort(key=lambda p: distances[p.id])
+
+        data = []
+        for p in properties:
+            item = p.to_dict(fields)
+            item["distance_km"] = round(distances[p.id], 3)
+            data.append(item)
+        return success_response(data, "Nearby properties retrieved successfully")
+    except ValueError as e:
+        return error_response("Bad Request", str(e), 400)
+    except Exception as e:
+        return error_response("Database Error", str(e), 500)
+
+# Get map marker clusters for a viewport (everyone can view)
+@properties_bp.route("/clusters", methods=["GET"])
+def get_property_clusters():
+    try:
+        bbox = parse_bbox(request.args.get("bbox"))
+    except ValueError as e:
+        return error_response("Bad Request", str(e), 400)
+    try:
+        zoom = int(request.args.get("zoom", 0))
+    except ValueError:
+        return error_response("Bad Request", "Zoom must be a valid number", 400)
+    if zoom < 0 or zoom > MAX_CLUSTER_ZOOM:
+        return error_response("Bad Request", f"Zoom must be between 0 and {MAX_CLUSTER_ZOOM}", 400)
+
+    try:
+        return success_response(cluster_index.clusters(bbox, zoom), "Clusters retrieved successfully")
     except Exception as e:
         return error_response("Database Error", str(e), 500)
 
+# Stream the whole (optionally filtered) catalog as NDJSON or CSV (everyone can view)
+@properties_bp.route("/export", methods=["GET"])
+def export_properties():
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return error_response("Bad Request", "Format must be one of: " + ", ".join(EXPORT_FORMATS), 400)
+    try:
+        filters = parse_property_filters(request.args)
+        fields = parse_fields(request.args)
+    except ValueError as e:
+        return error_response("Bad Request", str(e), 400)
+
+    # Server-side cursor: rows are fetched and serialized one batch at a time
+    statement = apply_property_filters(
+        select(Property).options(*property_load_options(fields)), filters
+    ).order_by(Property.id).execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+
+    def generate():
+        properties = db.session.scalars(statement)
+        if export_format == "ndjson":
+            yield from iter_ndjson(properties, fields)
+        else:
+            yield from iter_csv(properties, fields)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename=properties.{export_format}"}
+    )
+
+# Get response cache counters (admin only)
+@properties_bp.route("/cache/stats", methods=["GET"])
+@jwt_required()
+def get_cache_stats():
+    identity = get_jwt_identity()
+    if identity["user_type"] != "admin":
+        return error_response("Forbidden", "Only admins can view cache statistics", 403)
+    return success_response(response_cache.stats(), "Cache statistics retrieved successfully")
+
 # Get a property (everyone can view)
 @properties_bp.route("/<int:id>", methods=["GET"])
 def get_property(id):
+    # Buffered and written in bulk by the counter flusher
+    counter_buffer.record_view(id)
     try:
-        property = Property.query.get(id)
+        cached = response_cache.get(request.full_path)
+        if cached:
+            if is_not_modified(cached[1], cached[2]):
+                return not_modified_response(cached[1], cached[2])
+            return replay_response(cached)
+
+        # Revalidate against updated_at alone before loading and serializing the row
+        updated_at = db.session.query(Property.updated_at).filter(Property.id == id).scalar()
+        if updated_at is not None:
+            etag = make_etag("property", id, request.query_string.decode("utf-8"), updated_at)
+            if is_not_modified(etag, updated_at):
+                return not_modified_response(etag, updated_at)
+
+        property = Property.query.options(joinedload(Property.images)).get(id)
         if not property:
             return error_response("Not Found", f"Property {id} not found", 404)
-        return success_response(property.to_dict(), "Property retrieved successfully")
+        return store_response(request.full_path, with_cache_headers(
+            success_response(property.to_dict(), "Property retrieved successfully"),
+            make_etag("property", id, request.query_string.decode("utf-8"), property.updated_at),
+            property.updated_at
+        ), [property_tag(id)])
+    except Exception as e:
+        return error_response("Database Error", str(e), 500)
+
+# Favorite a property
+@properties_bp.route("/<int:id>/favorite", methods=["POST"])
+@jwt_required()
+def favorite_property(id):
+    identity = get_jwt_identity()
+    try:
+        if not db.session.get(Property, id):
+            return error_response("Not Found", f"Property {id} not found", 404)
+        if not db.session.get(Favorite, (identity["id"], id)):
+            db.session.add(Favorite(user_id=identity["id"], property_id=id))
+            db.session.commit()
+            counter_buffer.record_favorite(id, 1)
+        return success_response({"property_id": id}, "Property added to favorites")
     except Exception as e:
+        db.session.rollback()
+        return error_response("Database Error", str(e), 500)
+
+# Remove a property from favorites
+@properties_bp.route("/<int:id>/favorite", methods=["DELETE"])
+@jwt_required()
+def unfavorite_property(id):
+    identity = get_jwt_identity()
+    try:
+        favorite = db.session.get(Favorite, (identity["id"], id))
+        if favorite:
+            db.session.delete(favorite)
+            db.session.commit()
+            counter_buffer.record_favorite(id, -1)
+        return success_response({"property_id": id}, "Property removed from favorites")
+    except Exception as e:
+        db.session.rollback()
         return error_response("Database Error", str(e), 500)
 
 # Update property (only agent/admin who owns it)
@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+# Configuration is read at import time, so point it at a throwaway database
+# and upload folder before the app is imported
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ.setdefault("UPLOAD_FOLDER", tempfile.mkdtemp(prefix="aura-test-uploads-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+@pytest.fixture
+def app():
+    from app import create_app
+    from modelsdb import db, User, UserType
+    from utils.counters import counter_buffer
+
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+        agent = User("Test Agent", "agent@example.com", "Passw0rd!", UserType.AGENT)
+        db.session.add(agent)
+        db.session.commit()
+        yield app
+        counter_buffer.flush()  # Write recorded views while the tables exist
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,68 @@
+"""The incrementally maintained funnel aggregates match a full recount of the
+leads table after every kind of write."""
+from collections import defaultdict
+from sqlalchemy import select, func
+from modelsdb import db, User, UserType, Lead, LeadStatus, LeadFunnelCount
+from utils.lead_bulk import bulk_update_leads
+from utils.lead_dedup import merge_leads
+from utils.lead_stats import funnel_keys
+
+def recount():
+    """Funnel counts computed from scratch with a GROUP BY over leads"""
+    counts = defaultdict(int)
+    grouped = db.session.execute(
+        select(Lead.status, Lead.assigned_agent_id, Lead.source, func.count())
+        .group_by(Lead.status, Lead.assigned_agent_id, Lead.source)
+    )
+    for status, agent_id, source, count in grouped:
+        for key in funnel_keys(status, agent_id, source):
+            counts[key] += count
+    return {key: count for key, count in counts.items() if count}
+
+def maintained():
+    rows = LeadFunnelCount.query.filter(LeadFunnelCount.count != 0)
+    return {(row.dimension, row.dimension_value, row.status): row.count for row in rows}
+
+def test_funnel_counts_match_recount_after_every_write(app):
+    agent = User.query.filter_by(email="agent@example.com").one()
+    other_agent = User("Other Agent", "other@example.com", "Passw0rd!", UserType.AGENT)
+    client = User("Client", "client@example.com", "Passw0rd!", UserType.CLIENT)
+    db.session.add_all([other_agent, client])
+    db.session.commit()
+
+    # Create
+    leads = [
+        Lead(user_id=client.id, assigned_agent_id=agent.id if i % 2 else None,
+             source="website" if i % 3 else "referral", desired_location=f"Area {i % 4}")
+        for i in range(12)
+    ]
+    db.session.add_all(leads)
+    db.session.commit()
+    assert maintained() == recount()
+
+    # Update through the ORM: status, agent and source changes
+    leads[0].status = LeadStatus.CONTACTED
+    leads[1].assigned_agent_id = other_agent.id
+    leads[2].source = "open_house"
+    leads[3].status = LeadStatus.QUALIFIED
+    leads[3].assigned_agent_id = other_agent.id
+    db.session.commit()
+    assert maintained() == recount()
+
+    # Bulk update, by ids and by filter
+    bulk_update_leads([lead.id for lead in leads[4:8]], None, {"status": LeadStatus.CONTACTED})
+    bulk_update_leads(None, {"assigned_agent_id": agent.id}, {"assigned_agent_id": other_agent.id})
+    db.session.expire_all()
+    assert maintained() == recount()
+
+    # Merge duplicates into a survivor
+    survivor, duplicates = leads[8], leads[9:11]
+    merge_leads(survivor, duplicates)
+    db.session.commit()
+    assert maintained() == recount()
+
+    # Delete
+    db.session.delete(leads[11])
+    db.session.delete(leads[0])
+    db.session.commit()
+    assert maintained() == recount()
@@ -0,0 +1,56 @@
+"""Regression tests: property list and detail requests issue a fixed number
+of queries however many rows (and images) they return."""
+from sqlalchemy import event
+from modelsdb import db, User, Property, PropertyType, PropertyImage
+from utils.response_cache import response_cache
+
+def add_properties(count, images_per_property=2):
+    agent_id = User.query.filter_by(email="agent@example.com").one().id
+    ids = []
+    for i in range(count):
+        prop = Property(
+            title=f"Test listing {i}", description="A listing used in tests",
+            property_type=PropertyType.APARTMENT, price=100000 + i, address=f"{i} Test St",
+            city="Nairobi", state="KE", zip_code="00100", agent_id=agent_id
+        )
+        db.session.add(prop)
+        db.session.flush()
+        for order in range(images_per_property):
+            db.session.add(PropertyImage(property_id=prop.id, image_url=f"/uploads/{prop.id}-{order}.jpg",
+                                         is_primary=order == 0, order=order))
+        ids.append(prop.id)
+    db.session.commit()
+    return ids
+
+def count_queries(client, url):
+    """Number of SQL statements one uncached GET of url executes"""
+    client.get(url)  # Warm up lazily built in-process indexes
+    response_cache.clear()
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    return len(statements)
+
+def test_list_query_count_does_not_grow_with_rows(app):
+    client = app.test_client()
+    add_properties(1)
+    with_one = count_queries(client, "/api/properties/?limit=100")
+
+    add_properties(40)
+    with_many = count_queries(client, "/api/properties/?limit=100")
+    assert len(client.get("/api/properties/?limit=100").get_json()["data"]) == 41
+
+    assert with_many == with_one
+
+def test_detail_query_count_does_not_grow_with_images(app):
+    client = app.test_client()
+    [few] = add_properties(1, images_per_property=1)
+    [many] = add_properties(1, images_per_property=10)
+
+    assert count_queries(client, f"/api/properties/{many}") == count_queries(client, f"/api/properties/{few}")
@@ -0,0 +1,81 @@
+import logging
+from collections import defaultdict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# model class -> [(callback, wants previous values)]
+_subscribers = defaultdict(list)
+
+def subscribe(model, callback, previous=False):
+    """Call callback(action, values) after every committed change to a model row.
+
+    action is "insert", "update" or "delete" and values maps column names to
+    the row's values at flush time. With previous=True the callback is called
+    as callback(action, values, previous), previous mapping column names to
+    the values the row had before the change (None for inserts). Nothing is
+    dispatched for rolled back work. Callbacks run from the session's
+    after_commit hook, so they must not use db.session; open a separate
+    connection if they need the database.
+    """
+    _subscribers[model].append((callback, previous))
+
+def _snapshot(obj, loaded_only=False):
+    state = inspect(obj)
+    if loaded_only:
+        return {attr.key: state.dict.get(attr.key) for attr in state.mapper.column_attrs}
+    return {attr.key: getattr(obj, attr.key) for attr in state.mapper.column_attrs}
+
+def _previous_snapshot(obj, values):
+    # Only meaningful for attributes whose old value was loaded before being
+    # overwritten; fields that need it should have active history enabled
+    state = inspect(obj)
+    previous = dict(values)
+    for key in values:
+        history = state.attrs[key].history
+        if history.deleted:
+            previous[key] = history.deleted[0]
+    return previous
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault("committed_changes", [])
+    for obj in session.new:
+        if type(obj) in _subscribers:
+            pending.append((type(obj), "insert", _snapshot(obj), None))
+    for obj in session.dirty:
+        if type(obj) in _subscribers and session.is_modified(obj, include_collections=False):
+            values = _snapshot(obj)
+            pending.append((type(obj), "update", values, _previous_snapshot(obj, values)))
+    for obj in session.deleted:
+        if type(obj) in _subscribers:
+            values = _snapshot(obj, loaded_only=True)
+            pending.append((type(obj), "delete", values, values))
+
+def publish(model, action, rows, previous_rows=None):
+    """Dispatch already committed changes that bypassed the ORM unit of work
+    (bulk INSERT/UPDATE statements), one values dict per row, with the rows'
+    earlier values aligned in previous_rows where the caller has them.
+    """
+    for i, values in enumerate(rows):
+        _dispatch(model, action, values, previous_rows[i] if previous_rows is not None else None)
+
+def _dispatch(model, action, values, previous=None):
+    for callback, wants_previous in _subscribers[model]:
+        try:
+            if wants_previous:
+                callback(action, values, previous)
+            else:
+                callback(action, values)
+        except Exception:
+            logger.exception("Change subscriber for %s failed", model.__name__)
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changes(session):
+    for model, action, values, previous in session.info.pop("committed_changes", []):
+        _dispatch(model, action, values, previous)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("committed_changes", None)
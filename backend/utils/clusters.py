@@ -0,0 +1,146 @@
+import math
+import threading
+import time
+from modelsdb import db, Property
+from utils.change_tracking import subscribe
+from utils.table_versions import current_version, PROPERTIES
+
+MAX_CLUSTER_ZOOM = 16
+CELLS_PER_TILE = 4  # grid cells along each side of a map tile
+LOAD_ATTEMPTS = 3
+
+def cell_degrees(zoom):
+    """Grid cell size in degrees at a map zoom level"""
+    return 360.0 / (2 ** zoom * CELLS_PER_TILE)
+
+class ClusterIndex:
+    """Per-zoom grid aggregation of property coordinates.
+
+    Each zoom level maps a grid cell to [count, sum_lat, sum_lng], so cluster
+    centroids are sum / count. Levels are built lazily from the database on
+    first use and then kept current from committed property changes. Other
+    workers' changes only show up in the properties table version, so the
+    points are reloaded when it has moved, checked once per reload interval.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._points = None  # property id -> (lat, lng)
+        self._grids = {}  # zoom -> {(row, col): [count, sum_lat, sum_lng]}
+        self._version = None  # properties version the points were loaded at
+        self._checked_at = None  # time.monotonic() the version last matched
+        self._changes = 0  # Bumped by every applied change, to detect ones racing a load
+        self.reload_interval = 60
+
+    def init_app(self, app):
+        self.reload_interval = app.config.get("PROPERTY_CACHE_RELOAD_INTERVAL", 60)
+
+    def _load_points(self):
+        rows = db.session.query(Property.id, Property.latitude, Property.longitude) \
+            .filter(Property.latitude.isnot(None), Property.longitude.isnot(None))
+        return {property_id: (lat, lng) for property_id, lat, lng in rows}
+
+    def _is_current(self):
+        if self._points is None:
+            return False
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+            return True
+        if current_version(PROPERTIES)[0] != self._version:
+            return False
+        self._checked_at = now
+        return True
+
+    def _ensure_loaded(self):
+        if self._is_current():
+            return
+        for _ in range(LOAD_ATTEMPTS):
+            with self._lock:
+                changes = self._changes
+            # Read the version first: a write landing after it only causes
+            # one more reload, never a missed one
+            version = current_version(PROPERTIES)[0]
+            points = self._load_points()
+            with self._lock:
+                # A change applied mid-load may be missing from points
+                if self._changes == changes:
+                    self._points, self._grids = points, {}
+                    self._version, self._checked_at = version, time.monotonic()
+                    return
+        with self._lock:
+            # Kept racing changes: serve what is built, or else the last load
+            # until the next use reloads it
+            if self._points is None:
+                self._points, self._grids = points, {}
+                self._version, self._checked_at = None, None
+
+    def _grid(self, zoom):
+        grid = self._grids.get(zoom)
+        if grid is None:
+            grid = {}
+            for lat, lng in self._points.values():
+                self._add(grid, zoom, lat, lng, 1)
+            self._grids[zoom] = grid
+        return grid
+
+    @staticmethod
+    def _add(grid, zoom, lat, lng, sign):
+        size = cell_degrees(zoom)
+        key = (math.floor(lat / size), math.floor(lng / size))
+        cell = grid.setdefault(key, [0, 0.0, 0.0])
+        cell[0] += sign
+        cell[1] += sign * lat
+        cell[2] += sign * lng
+        if cell[0] <= 0:
+            del grid[key]
+
+    def clusters(self, bbox, zoom):
+        """Return the non-empty clusters whose cells intersect bbox"""
+        min_lng, min_lat, max_lng, max_lat = bbox
+        size = cell_degrees(zoom)
+        rows = range(math.floor(min_lat / size), math.floor(max_lat / size) + 1)
+        cols = range(math.floor(min_lng / size), math.floor(max_lng / size) + 1)
+
+        self._ensure_loaded()
+        with self._lock:
+            grid = self._grid(zoom)
+            if len(rows) * len(cols) < len(grid):
+                cells = ((key, grid.get(key)) for key in ((r, c) for r in rows for c in cols))
+            else:
+                cells = grid.items()
+            result = []
+            for (row, col), cell in cells:
+                if cell is None or row not in rows or col not in cols:
+                    continue
+                count, sum_lat, sum_lng = cell
+                result.append({
+                    "cell": f"{zoom}/{row}/{col}",
+                    "count": count,
+                    "latitude": sum_lat / count,
+                    "longitude": sum_lng / count
+                })
+            return result
+
+    def apply_change(self, action, values):
+        """Move a single property between cells on every built zoom level"""
+        with self._lock:
+            self._changes += 1
+            if self._points is None:
+                return  # Nothing built yet, the first read loads fresh data
+            property_id = values.get("id")
+            old = self._points.pop(property_id, None)
+            if old is not None:
+                for zoom, grid in self._grids.items():
+                    self._add(grid, zoom, old[0], old[1], -1)
+            if action == "delete":
+                return
+            lat, lng = values.get("latitude"), values.get("longitude")
+            if lat is None or lng is None:
+                return
+            new = (float(lat), float(lng))
+            self._points[property_id] = new
+            for zoom, grid in self._grids.items():
+                self._add(grid, zoom, new[0], new[1], 1)
+
+cluster_index = ClusterIndex()
+subscribe(Property, cluster_index.apply_change)
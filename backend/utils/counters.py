@@ -0,0 +1,86 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from sqlalchemy import case, func, update
+from modelsdb import db, Property
+
+logger = logging.getLogger(__name__)
+
+class PropertyCounterBuffer:
+    """Write-behind accumulator for Property.view_count and favorite_count.
+
+    Requests only bump in-memory totals. A background thread writes the
+    aggregated increments every few seconds as one UPDATE, and a final
+    flush runs at interpreter exit so graceful shutdowns keep every count.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: [0, 0])  # property id -> [views, favorites]
+        self._app = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self._app = app
+        self.interval = app.config.get("COUNTER_FLUSH_INTERVAL", 5)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="property-counters", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def record_view(self, property_id, count=1):
+        with self._lock:
+            self._pending[property_id][0] += count
+
+    def record_favorite(self, property_id, delta=1):
+        with self._lock:
+            self._pending[property_id][1] += delta
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def shutdown(self):
+        self._stop.set()
+        self.flush()
+
+    def flush(self):
+        """Write all pending increments in a single UPDATE"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, defaultdict(lambda: [0, 0])
+
+        ids = list(pending)
+        views = case({pid: counts[0] for pid, counts in pending.items()}, value=Property.id, else_=0)
+        favorites = case({pid: counts[1] for pid, counts in pending.items()}, value=Property.id, else_=0)
+        statement = (
+            update(Property)
+            .where(Property.id.in_(ids))
+            .values(
+                view_count=func.coalesce(Property.view_count, 0) + views,
+                favorite_count=func.coalesce(Property.favorite_count, 0) + favorites,
+                # Counter traffic is not an edit: keep updated_at (and the ETags
+                # and cached responses derived from it) as they are
+                updated_at=Property.updated_at
+            )
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            with self._app.app_context():
+                db.session.execute(statement)
+                db.session.commit()
+        except Exception:
+            logger.exception("Flushing property counters failed, keeping them for the next run")
+            with self._app.app_context():
+                db.session.rollback()
+            with self._lock:
+                for pid, (view_delta, favorite_delta) in pending.items():
+                    self._pending[pid][0] += view_delta
+                    self._pending[pid][1] += favorite_delta
+            return 0
+        return len(ids)
+
+counter_buffer = PropertyCounterBuffer()
@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+from utils.fieldsets import PROPERTY_FIELDS
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def iter_ndjson(properties, fields=None):
+    """Yield one JSON document per property, batched into larger chunks"""
+    lines = []
+    for prop in properties:
+        lines.append(json.dumps(prop.to_dict(fields)))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+def iter_csv(properties, fields=None):
+    """Yield CSV text for properties, header first; nested images are left out"""
+    columns = [f for f in (fields or PROPERTY_FIELDS) if f != "images"]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    rows = 0
+    for prop in properties:
+        data = prop.to_dict(columns)
+        writer.writerow(["" if data[c] is None else data[c] for c in columns])
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
@@ -0,0 +1,70 @@
+from sqlalchemy import func, case
+from modelsdb import db, Property
+from utils.property_search import apply_property_filters
+from utils.search_index import match_clause
+
+MAX_CITY_FACETS = 20
+
+BEDROOM_BUCKETS = [(0, "0"), (1, "1"), (2, "2"), (3, "3"), (4, "4")]
+BEDROOM_OVERFLOW = "5+"
+
+PRICE_BUCKETS = [
+    (100000, "0-100000"),
+    (250000, "100000-250000"),
+    (500000, "250000-500000"),
+    (1000000, "500000-1000000"),
+]
+PRICE_OVERFLOW = "1000000+"
+
+# Filters ignored when counting each facet, so the sidebar still shows the
+# other values a user can switch to
+FACET_OWN_FILTERS = {
+    "property_type": ("property_type",),
+    "city": ("city",),
+    "bedrooms": ("min_bedrooms",),
+    "price": ("min_price", "max_price"),
+}
+
+def _bedroom_bucket():
+    # Properties without a bedroom count fall into no bucket (NULL)
+    return case(
+        *[(Property.bedrooms == value, label) for value, label in BEDROOM_BUCKETS],
+        (Property.bedrooms > BEDROOM_BUCKETS[-1][0], BEDROOM_OVERFLOW)
+    )
+
+def _price_bucket():
+    return case(
+        *[(Property.price < upper, label) for upper, label in PRICE_BUCKETS],
+        else_=PRICE_OVERFLOW
+    )
+
+def _count_by(column, filters, q, own_filters, limit=None):
+    scoped = {k: v for k, v in filters.items() if k not in own_filters}
+    count = func.count(Property.id)
+    query = apply_property_filters(db.session.query(column, count), scoped)
+    if q:
+        query = query.filter(match_clause(q))
+    query = query.group_by(column).order_by(count.desc())
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+def property_facets(filters, q=None):
+    """Count the properties matching filters (and q) per facet value.
+
+    Each facet is one grouped aggregate query that skips the facet's own
+    filter.
+    """
+    type_counts = _count_by(Property.property_type, filters, q, FACET_OWN_FILTERS["property_type"])
+    city_counts = _count_by(Property.city, filters, q, FACET_OWN_FILTERS["city"], MAX_CITY_FACETS)
+    bedroom_counts = dict(_count_by(_bedroom_bucket(), filters, q, FACET_OWN_FILTERS["bedrooms"]))
+    price_counts = dict(_count_by(_price_bucket(), filters, q, FACET_OWN_FILTERS["price"]))
+
+    bedroom_labels = [label for _, label in BEDROOM_BUCKETS] + [BEDROOM_OVERFLOW]
+    price_labels = [label for _, label in PRICE_BUCKETS] + [PRICE_OVERFLOW]
+    return {
+        "property_type": {t.value: c for t, c in type_counts},
+        "city": {city: c for city, c in city_counts},
+        "bedrooms": {label: bedroom_counts.get(label, 0) for label in bedroom_labels},
+        "price": {label: price_counts.get(label, 0) for label in price_labels},
+    }
@@ -0,0 +1,52 @@
+from sqlalchemy.orm import load_only, selectinload, lazyload
+from modelsdb import Property
+
+# Keys Property.to_dict can emit
+PROPERTY_FIELDS = [
+    "id", "title", "description", "property_type", "price", "address", "city",
+    "state", "zip_code", "latitude", "longitude", "bedrooms", "bathrooms",
+    "square_feet", "lot_size", "year_built", "parking_spaces", "features",
+    "amenities", "status", "is_featured", "view_count", "favorite_count",
+    "agent_id", "images", "created_at", "updated_at"
+]
+
+# Named presets for view=
+PROPERTY_VIEWS = {
+    "card": [
+        "id", "title", "property_type", "price", "address", "city", "status",
+        "is_featured", "bedrooms", "bathrooms", "square_feet", "images"
+    ],
+    "full": None,
+}
+
+# Columns every list query needs whatever the client asked for (keyset cursors)
+ALWAYS_LOADED = ["id", "created_at"]
+
+def parse_fields(args):
+    """Return the list of property keys requested via fields= or view=, or None for all"""
+    if args.get("fields"):
+        fields = [f.strip() for f in args["fields"].split(",") if f.strip()]
+        unknown = [f for f in fields if f not in PROPERTY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if "id" not in fields:
+            fields.insert(0, "id")
+        return fields
+    view = args.get("view")
+    if view:
+        if view not in PROPERTY_VIEWS:
+            raise ValueError("View must be one of: " + ", ".join(PROPERTY_VIEWS))
+        return PROPERTY_VIEWS[view]
+    return None
+
+def property_load_options(fields):
+    """Query options loading only the columns and relationships fields need"""
+    if fields is None:
+        return [selectinload(Property.images)]
+    columns = [f for f in fields if f != "images"]
+    for column in ALWAYS_LOADED:
+        if column not in columns:
+            columns.append(column)
+    options = [load_only(*[getattr(Property, c) for c in columns])]
+    options.append(selectinload(Property.images) if "images" in fields else lazyload(Property.images))
+    return options
@@ -0,0 +1,123 @@
+import math
+from sqlalchemy import and_, or_
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # ~5m cells, stored on every property
+MAX_COVER_CELLS = 32  # upper bound on prefixes OR'ed into one spatial query
+EARTH_RADIUS_KM = 6371.0
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits = bits << 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(geohash)
+
+def cell_size(precision):
+    """Return the (height, width) in degrees of a geohash cell"""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+def parse_bbox(value):
+    """Parse 'min_lng,min_lat,max_lng,max_lat' into a tuple of floats"""
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in value.split(","))
+    except (ValueError, AttributeError):
+        raise ValueError("Bbox must be min_lng,min_lat,max_lng,max_lat")
+    if not (-180 <= min_lng <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("Bbox coordinates are out of range")
+    return min_lng, min_lat, max_lng, max_lat
+
+def bbox_around(lat, lng, radius_km):
+    """Return the bbox enclosing a circle, clamped to valid coordinates"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    lng_delta = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return (
+        max(lng - lng_delta, -180.0),
+        max(lat - lat_delta, -90.0),
+        min(lng + lng_delta, 180.0),
+        min(lat + lat_delta, 90.0),
+    )
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two coordinates in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def cover_bbox(bbox):
+    """Return the geohash prefixes whose cells together cover the bbox.
+
+    Picks the finest precision that still needs at most MAX_COVER_CELLS cells.
+    An empty list means the bbox is too large for the index to help.
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    best = set()
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        cols = math.floor(max_lng / width) - math.floor(min_lng / width) + 1
+        if rows * cols > MAX_COVER_CELLS:
+            break
+        cells = set()
+        for row in range(rows):
+            lat = min(min_lat + row * height, max_lat)
+            for col in range(cols):
+                lng = min(min_lng + col * width, max_lng)
+                cells.add(encode_geohash(lat, lng, precision))
+        # Make sure the far edges are in even if stepping skipped past them
+        for lat in (min_lat, max_lat):
+            for lng in (min_lng, max_lng):
+                cells.add(encode_geohash(lat, lng, precision))
+        best = cells
+    return sorted(best)
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater than every geohash starting with prefix"""
+    while prefix:
+        index = BASE32.index(prefix[-1])
+        if index + 1 < len(BASE32):
+            return prefix[:-1] + BASE32[index + 1]
+        prefix = prefix[:-1]
+    return None
+
+def bbox_clause(model, bbox):
+    """SQL condition selecting rows of model inside bbox via the geohash index"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    conditions = [
+        model.latitude.between(min_lat, max_lat),
+        model.longitude.between(min_lng, max_lng),
+    ]
+    prefix_ranges = []
+    for prefix in cover_bbox(bbox):
+        upper = _prefix_upper_bound(prefix)
+        if upper is None:
+            prefix_ranges.append(model.geohash >= prefix)
+        else:
+            prefix_ranges.append(and_(model.geohash >= prefix, model.geohash < upper))
+    if prefix_ranges:
+        conditions.append(or_(*prefix_ranges))
+    return and_(*conditions)
@@ -0,0 +1,53 @@
+from sqlalchemy import inspect, select, update, bindparam, text
+from modelsdb import db, Property
+from utils.geo import encode_geohash
+
+GEOHASH_BACKFILL_CHUNK_SIZE = 1000
+
+def ensure_geohash_column():
+    """Add properties.geohash and its index to tables created before it existed.
+
+    db.create_all() only creates missing tables, never missing columns.
+    """
+    inspector = inspect(db.engine)
+    if "geohash" in {column["name"] for column in inspector.get_columns("properties")}:
+        return False
+    column_type = Property.__table__.c.geohash.type.compile(dialect=db.engine.dialect)
+    with db.engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE properties ADD COLUMN geohash {column_type}"))
+        for index in Property.__table__.indexes:
+            if [c.name for c in index.columns] == ["geohash"]:
+                index.create(connection, checkfirst=True)
+    return True
+
+def backfill_property_geohashes():
+    """Fill geohash for rows written before it was maintained; returns rows updated.
+
+    Spatial filters require a geohash prefix match, so rows left NULL would
+    never show up in /near or bbox searches.
+    """
+    table = Property.__table__
+    # Not an edit: updated_at (and the ETags derived from it) stays as it is
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("property_id"))
+        .values(geohash=bindparam("hash"), updated_at=table.c.updated_at)
+    )
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Property.id, Property.latitude, Property.longitude)
+            .where(Property.geohash.is_(None), Property.latitude.isnot(None),
+                   Property.longitude.isnot(None), Property.id > last_id)
+            .order_by(Property.id)
+            .limit(GEOHASH_BACKFILL_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            return updated
+        db.session.execute(statement, [
+            {"property_id": id, "hash": encode_geohash(float(lat), float(lng))} for id, lat, lng in rows
+        ])
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
@@ -0,0 +1,37 @@
+import hashlib
+from datetime import timezone
+from flask import request, make_response
+
+def make_etag(*parts):
+    """Build an ETag value from the parts that identify a representation"""
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _http_datetime(value):
+    # HTTP dates carry whole seconds in UTC; stored timestamps are naive UTC
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+def is_not_modified(etag, last_modified=None):
+    """Check the request's validators against the current representation"""
+    if request.if_none_match:
+        return etag in request.if_none_match
+    last_modified = _http_datetime(last_modified)
+    if last_modified and request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+def not_modified_response(etag, last_modified=None):
+    """Empty 304 response carrying the current validators"""
+    return with_cache_headers((make_response("", 304), 304), etag, last_modified)
+
+def with_cache_headers(result, etag, last_modified=None):
+    """Attach ETag/Last-Modified to a (response, status) pair from the response helpers"""
+    response, status_code = result
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _http_datetime(last_modified)
+    # Clients may keep a copy but must revalidate before using it
+    response.headers["Cache-Control"] = "no-cache"
+    return response, status_code
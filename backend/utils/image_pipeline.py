@@ -0,0 +1,151 @@
+import atexit
+import logging
+import os
+import tempfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from modelsdb import db, PropertyImage
+from utils.image_storage import (variant_path, uploaded_file_path, is_staged, store_file, get_upload_dir,
+                                 release_unreferenced)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it originals are served as uploaded
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (480, 480)
+WEBP_MAX_SIZE = (1920, 1920)
+WEBP_QUALITY = 82
+
+def _url_for(path):
+    return f"/uploads/{os.path.basename(path)}"
+
+def strip_image_metadata(path, target_path):
+    """Write path to target_path without EXIF/XMP, applying its orientation first"""
+    with Image.open(path) as source:
+        image_format = source.format
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    # Re-encoding without passing exif= drops the metadata
+    image.info.pop("exif", None)
+    image.info.pop("xmp", None)
+    save_kwargs = {"quality": 90} if image_format == "JPEG" else {}
+    with open(target_path, "wb") as target:
+        image.save(target, format=image_format, **save_kwargs)
+
+def process_image_file(path):
+    """Write the WebP variants of a stored upload.
+
+    Returns (webp_path, thumbnail_path). Originals are never rewritten here:
+    their names are content hashes served as immutable.
+    """
+    with Image.open(path) as source:
+        image_format = source.format
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    if image_format == "GIF":
+        image = image.convert("RGBA")
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    webp_path = variant_path(path, "_full.webp")
+    full = image.copy()
+    full.thumbnail(WEBP_MAX_SIZE)
+    full.save(webp_path, format="WEBP", quality=WEBP_QUALITY, method=4)
+
+    thumbnail_path = variant_path(path, "_thumb.webp")
+    thumbnail = image.copy()
+    thumbnail.thumbnail(THUMBNAIL_SIZE)
+    thumbnail.save(thumbnail_path, format="WEBP", quality=WEBP_QUALITY, method=4)
+    return webp_path, thumbnail_path
+
+class ImagePipeline:
+    """Worker pool that post-processes uploaded property images off the request path"""
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+
+    def init_app(self, app):
+        self._app = app
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=app.config.get("IMAGE_WORKERS", 2), thread_name_prefix="image-pipeline"
+            )
+            atexit.register(self._executor.shutdown, wait=True)
+
+    def submit(self, image_id):
+        """Queue an uploaded image for processing once its PropertyImage row is committed"""
+        return self._executor.submit(self._process, image_id)
+
+    def _publish_stripped(self, staged_url):
+        """Store a stripped copy of a staged upload under its own hash and
+        point every image row using the staged file at it. Returns the new
+        URL. The staged file is left to upload_sweeper, since an upload of
+        the same bytes may still be about to reference it.
+        """
+        _, extension = os.path.splitext(staged_url)
+        handle, temp_path = tempfile.mkstemp(dir=get_upload_dir(), suffix=".tmp")
+        os.close(handle)
+        try:
+            strip_image_metadata(uploaded_file_path(staged_url), temp_path)
+            url = store_file(temp_path, extension)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        for image in PropertyImage.query.filter_by(image_url=staged_url):
+            image.image_url = url
+            image.property.updated_at = datetime.utcnow()
+        db.session.commit()
+        release_unreferenced([staged_url])
+        return url
+
+    def _process(self, image_id):
+        with self._app.app_context():
+            image = db.session.get(PropertyImage, image_id)
+            if image is None:
+                return  # Deleted while it was queued
+            url = image.image_url
+            status, webp_url, thumbnail_url = "skipped", None, None
+            if is_staged(url):
+                try:
+                    url = self._publish_stripped(url)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Stripping metadata from %s failed", url)
+                    status, url = "failed", None
+
+            if url is not None:
+                path = uploaded_file_path(url)
+                webp_path = variant_path(path, "_full.webp")
+                thumbnail_path = variant_path(path, "_thumb.webp")
+                if os.path.exists(webp_path) and os.path.exists(thumbnail_path):
+                    # Same content was uploaded and processed before
+                    status, webp_url, thumbnail_url = "ready", _url_for(webp_path), _url_for(thumbnail_path)
+                elif Image is not None:
+                    try:
+                        webp_path, thumbnail_path = process_image_file(path)
+                        status, webp_url, thumbnail_url = "ready", _url_for(webp_path), _url_for(thumbnail_path)
+                    except Exception:
+                        logger.exception("Processing image %s failed", path)
+                        status = "failed"
+
+            try:
+                image = db.session.get(PropertyImage, image_id)
+                if image is None:
+                    return  # Deleted while it was processed
+                image.processing_status = status
+                image.webp_url = webp_url
+                image.thumbnail_url = thumbnail_url
+                # Property ETags derive from updated_at; without this clients
+                # revalidating would keep the pre-processing image fields
+                image.property.updated_at = datetime.utcnow()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Updating image %s failed", image_id)
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,258 @@
+import atexit
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from werkzeug.exceptions import RequestEntityTooLarge
+from sqlalchemy import select
+from config import Config
+from modelsdb import db, PropertyImage
+from utils.change_tracking import subscribe
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it originals are stored as uploaded
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Variants written by the image pipeline next to each original
+VARIANT_SUFFIXES = ("_full.webp", "_thumb.webp")
+# Spellings of the same format share one stored file
+EXTENSION_ALIASES = {".jpeg": ".jpg"}
+
+# Uploads still carrying metadata wait here, out of reach of the /uploads/
+# route, until the image pipeline has stored a stripped copy
+STAGING_DIR = "incoming"
+STAGED_URL_PREFIX = f"/uploads/{STAGING_DIR}/"
+
+def get_upload_dir():
+    return Config.UPLOAD_FOLDER
+
+def uploaded_file_path(url):
+    """Map an /uploads/ URL back to its file on disk"""
+    if is_staged(url):
+        return os.path.join(get_upload_dir(), STAGING_DIR, os.path.basename(url))
+    return os.path.join(get_upload_dir(), os.path.basename(url))
+
+def is_staged(url):
+    """Whether url names an upload not yet stripped of metadata (not served)"""
+    return url.startswith(STAGED_URL_PREFIX)
+
+def variant_path(path, suffix):
+    base, _ = os.path.splitext(path)
+    return base + suffix
+
+def has_image_metadata(path):
+    """Whether an image carries EXIF/XMP (which may hold GPS coordinates).
+
+    Only the header is parsed, so this is cheap enough for the request path;
+    the actual rewrite happens in the image pipeline.
+    """
+    if Image is None:
+        return False
+    try:
+        with Image.open(path) as source:
+            return "exif" in source.info or "xmp" in source.info
+    except Exception:
+        return False  # Not an image Pillow reads; stored as uploaded
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest
+
+def store_file(temp_path, extension, digest=None, staged=False):
+    """Move a finished temporary file to its content-addressed name and
+    return its URL; digest is hashed from the file when not given.
+    """
+    if digest is None:
+        digest = _file_digest(temp_path)
+    directory = os.path.join(get_upload_dir(), STAGING_DIR) if staged else get_upload_dir()
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{digest.hexdigest()}{extension}"
+    # Replace even when the hash is already stored: the content is the
+    # same, the file is guaranteed to exist, and its fresh mtime keeps
+    # release_unreferenced away until this upload's row is committed
+    os.replace(temp_path, os.path.join(directory, filename))
+    return (STAGED_URL_PREFIX if staged else "/uploads/") + filename
+
+class StreamedUpload:
+    """Write target for one multipart file part.
+
+    Werkzeug writes the part here chunk by chunk while parsing the request:
+    bytes are hashed and appended to a temporary file inside the upload
+    directory, so nothing is buffered in memory. Going past max_size aborts
+    the request with 413 straight away. commit() renames the file to the
+    hash of its bytes, so the name always matches the content and can be
+    cached as immutable. Files carrying metadata are staged instead of
+    published; the image pipeline publishes a stripped copy.
+    """
+
+    def __init__(self, extension, max_size):
+        self.extension = EXTENSION_ALIASES.get(extension.lower(), extension.lower())
+        self.max_size = max_size
+        self.size = 0
+        self._digest = hashlib.sha256()
+        upload_dir = get_upload_dir()
+        os.makedirs(upload_dir, exist_ok=True)
+        handle, self.temp_path = tempfile.mkstemp(dir=upload_dir, suffix=".tmp")
+        self._file = os.fdopen(handle, "wb")
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            self.discard()
+            raise RequestEntityTooLarge(f"Each image must be at most {self.max_size // (1024 * 1024)}MB")
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # Werkzeug rewinds the part once it is written; reading goes through commit()
+        return self.size
+
+    def tell(self):
+        return self.size
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def commit(self):
+        """Move the spooled file to its content-addressed name and return its URL"""
+        self.close()
+        staged = has_image_metadata(self.temp_path)
+        return store_file(self.temp_path, self.extension, self._digest, staged=staged)
+
+    def discard(self):
+        self.close()
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+def _is_recent(path, grace):
+    try:
+        return time.time() - os.path.getmtime(path) < grace
+    except FileNotFoundError:
+        return False
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        logger.exception("Removing %s failed", path)
+
+def _referenced(urls):
+    # Uses its own connection: this also runs from commit hooks, where the
+    # session cannot emit SQL
+    with db.engine.connect() as connection:
+        return set(connection.scalars(
+            select(PropertyImage.image_url).where(PropertyImage.image_url.in_(set(urls))).distinct()
+        ))
+
+def _remove_stored_file(url, grace):
+    """Delete one unreferenced upload; returns False if it must be retried later.
+
+    A concurrent upload of the same content may already have reused the file
+    without its row being committed yet, so files written within the grace
+    period are kept. Taking the file away is an atomic rename to a
+    tombstone; if a reuse landed between the checks and the rename, the
+    tombstone is fresh and is put back.
+    """
+    path = uploaded_file_path(url)
+    if _is_recent(path, grace):
+        return False
+    tombstone = path + ".deleting"
+    try:
+        os.rename(path, tombstone)
+    except FileNotFoundError:
+        return True
+    if _is_recent(tombstone, grace):
+        os.replace(tombstone, path)  # Same bytes as any newer copy
+        return False
+    _remove_quietly(tombstone)
+    if not os.path.exists(path):
+        for suffix in VARIANT_SUFFIXES:
+            _remove_quietly(variant_path(path, suffix))
+    return True
+
+def release_unreferenced(urls):
+    """Delete stored files (and their variants) that no PropertyImage points at any more.
+
+    Files too recently written to delete safely are left to upload_sweeper.
+    """
+    urls = set(urls)
+    if not urls:
+        return
+    grace = upload_sweeper.grace
+    deferred = set()
+    for url in urls - _referenced(urls):
+        if not _remove_stored_file(url, grace):
+            deferred.add(url)
+    upload_sweeper.defer(deferred)
+
+class UploadSweeper:
+    """Background retry of deletions that hit the grace period, plus cleanup
+    of temporary files left behind by interrupted uploads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deferred = set()
+        self._app = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.grace = 600
+        self.interval = 300
+
+    def init_app(self, app):
+        self._app = app
+        self.grace = app.config.get("UPLOAD_DELETE_GRACE", 600)
+        self.interval = app.config.get("UPLOAD_SWEEP_INTERVAL", 300)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="upload-sweeper", daemon=True)
+            self._thread.start()
+            atexit.register(self._stop.set)
+
+    def defer(self, urls):
+        with self._lock:
+            self._deferred.update(urls)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self._app.app_context():
+                    self.sweep()
+            except Exception:
+                logger.exception("Sweeping uploads failed")
+
+    def sweep(self):
+        """Retry deferred deletions and drop stale temporary files"""
+        with self._lock:
+            pending, self._deferred = self._deferred, set()
+        if pending:
+            release_unreferenced(pending)
+
+        upload_dir = get_upload_dir()
+        if not os.path.isdir(upload_dir):
+            return
+        for name in os.listdir(upload_dir):
+            if name.endswith((".tmp", ".deleting")):
+                path = os.path.join(upload_dir, name)
+                if not _is_recent(path, self.grace):
+                    _remove_quietly(path)
+
+upload_sweeper = UploadSweeper()
+
+def _release_deleted_image(action, values):
+    if action == "delete" and values.get("image_url"):
+        release_unreferenced([values["image_url"]])
+
+subscribe(PropertyImage, _release_deleted_image)
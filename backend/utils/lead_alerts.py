@@ -0,0 +1,108 @@
+import atexit
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, insert, or_
+from modelsdb import db, Lead, Property, Communication, OPEN_LEAD_STATUSES
+from utils.matching import split_preferences
+
+logger = logging.getLogger(__name__)
+
+# Candidate leads are fetched and filtered this many rows at a time
+ALERT_BATCH_SIZE = 2000
+
+def _preference_keys(values):
+    """Encode comma separated preferences as ",a,b," so membership is a substring test"""
+    return np.array([
+        "," + ",".join(split_preferences(value)) + "," if value else ""
+        for value in values
+    ])
+
+def _contains(keys, term):
+    if not term:
+        return np.zeros(len(keys), dtype=bool)
+    return np.char.find(keys, f",{term.strip().lower()},") >= 0
+
+def filter_matching_leads(rows, property):
+    """Vectorized location/type/bedroom filter over a batch of candidate lead rows.
+
+    rows are (id, user_id, desired_location, desired_property_type,
+    desired_bedrooms) tuples that already passed the budget check; leads
+    without a preference for a criterion match any listing.
+    """
+    ids, user_ids, locations, types, bedrooms = zip(*rows)
+    locations = _preference_keys(locations)
+    types = _preference_keys(types)
+    wanted_bedrooms = np.array([np.nan if b is None else b for b in bedrooms], dtype=float)
+
+    matched = (locations == "") | _contains(locations, property.city) | _contains(locations, property.state)
+    matched &= (types == "") | _contains(types, property.property_type.value)
+    if property.bedrooms is not None:
+        matched &= np.isnan(wanted_bedrooms) | (wanted_bedrooms <= property.bedrooms)
+
+    return [(ids[i], user_ids[i]) for i in np.flatnonzero(matched)]
+
+def candidate_leads_query(property):
+    """Open leads whose budget admits the listing's price (served by ix_leads_status_budget)"""
+    return select(
+        Lead.id, Lead.user_id, Lead.desired_location, Lead.desired_property_type, Lead.desired_bedrooms
+    ).where(
+        Lead.status.in_(OPEN_LEAD_STATUSES),
+        or_(Lead.budget_min.is_(None), Lead.budget_min <= property.price),
+        or_(Lead.budget_max.is_(None), Lead.budget_max >= property.price),
+        Lead.user_id != property.agent_id,
+    )
+
+class ListingAlerts:
+    """Worker that messages the clients of open leads a new listing fits.
+
+    Matching runs off the request path so publishing a property costs the
+    same however many leads exist.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+
+    def init_app(self, app):
+        self._app = app
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=app.config.get("LEAD_ALERT_WORKERS", 1), thread_name_prefix="lead-alerts"
+            )
+            atexit.register(self._executor.shutdown, wait=True)
+
+    def submit(self, property_id):
+        """Queue a committed property for matching against open leads"""
+        return self._executor.submit(self._notify, property_id)
+
+    def _notify(self, property_id):
+        with self._app.app_context():
+            try:
+                property = db.session.get(Property, property_id)
+                if property is None or property.status != "active":
+                    return 0
+
+                stmt = candidate_leads_query(property).execution_options(yield_per=ALERT_BATCH_SIZE)
+                matches = []
+                for batch in db.session.execute(stmt).partitions():
+                    matches.extend(filter_matching_leads(batch, property))
+                if not matches:
+                    return 0
+
+                subject = f"New listing matches your search: {property.title}"
+                message = (f"{property.title} in {property.city}, {property.state} "
+                           f"is now listed at {property.price:,.0f}.")
+                db.session.execute(insert(Communication), [
+                    {"lead_id": lead_id, "sender_id": property.agent_id, "recipient_id": user_id,
+                     "subject": subject[:200], "message": message}
+                    for lead_id, user_id in matches
+                ])
+                db.session.commit()
+                return len(matches)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Notifying leads about property %s failed", property_id)
+                return 0
+
+listing_alerts = ListingAlerts()
@@ -0,0 +1,208 @@
+import atexit
+import heapq
+import logging
+import threading
+from sqlalchemy import func
+from modelsdb import db, Lead, LeadStatus, User, UserType, OPEN_LEAD_STATUSES
+from utils.change_tracking import subscribe
+from utils.matching import split_preferences
+
+logger = logging.getLogger(__name__)
+
+ALL_AGENTS = "*"
+RELOAD_ATTEMPTS = 3
+
+def _is_open(status):
+    if status is None:
+        return False
+    if isinstance(status, str):
+        status = LeadStatus(status)
+    return status in OPEN_LEAD_STATUSES
+
+def _is_agent(user_type):
+    if isinstance(user_type, str):
+        user_type = UserType(user_type)
+    return user_type == UserType.AGENT
+
+class LeadAssigner:
+    """Routes new leads to the least loaded agent covering their area.
+
+    Every agent sits in a min-heap of (open lead count, agent id) for each
+    service area, each specialization and each (area, specialization)
+    pair, plus one heap holding all agents. Picking an agent peeks at the
+    relevant heaps; when a count changes a fresh entry is pushed and the
+    stale one is skipped lazily, so both stay O(log agents).
+
+    Counts come from one grouped count of open leads per agent, which a
+    background thread repeats every reload interval (other workers' commits
+    are only seen then); in between they follow the lead changes committed
+    in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._changes = 0  # Bumped by every applied change, to detect ones racing a reload
+        self.reload_interval = 60
+        self._heaps = {}  # key -> [(open count, agent id)]
+        self._agent_keys = {}  # agent id -> keys it is listed under
+        self._open_counts = {}  # agent id -> open leads assigned
+        self._app = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self._app = app
+        self.reload_interval = app.config.get("LEAD_ASSIGNMENT_RELOAD_INTERVAL", 60)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lead-assignment", daemon=True)
+            self._thread.start()
+            atexit.register(self._stop.set)
+
+    def _run(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                with self._app.app_context():
+                    self.reload()
+            except Exception:
+                logger.exception("Reloading agent lead counts failed")
+
+    def _keys_for(self, service_areas, specializations):
+        areas = split_preferences(service_areas)
+        specialties = split_preferences(specializations)
+        keys = {ALL_AGENTS}
+        keys.update(("area", a) for a in areas)
+        keys.update(("spec", s) for s in specialties)
+        keys.update(("area_spec", a, s) for a in areas for s in specialties)
+        return keys
+
+    def _push(self, agent_id):
+        entry = (self._open_counts[agent_id], agent_id)
+        for key in self._agent_keys[agent_id]:
+            heap = self._heaps.setdefault(key, [])
+            heapq.heappush(heap, entry)
+            if len(heap) > 64 and len(heap) > 4 * len(self._agent_keys):
+                self._rebuild(key)
+
+    def _rebuild(self, key):
+        heap = [(count, agent_id) for agent_id, count in self._open_counts.items()
+                if key in self._agent_keys[agent_id]]
+        heapq.heapify(heap)
+        self._heaps[key] = heap
+
+    def _peek(self, key):
+        heap = self._heaps.get(key)
+        while heap:
+            count, agent_id = heap[0]
+            if key in self._agent_keys.get(agent_id, ()) and self._open_counts[agent_id] == count:
+                return heap[0]
+            heapq.heappop(heap)  # Stale: count changed or agent left the area
+        return None
+
+    def _set_agent(self, agent_id, service_areas, specializations):
+        self._agent_keys[agent_id] = self._keys_for(service_areas, specializations)
+        self._open_counts.setdefault(agent_id, 0)
+        self._push(agent_id)
+
+    def _remove_agent(self, agent_id):
+        self._agent_keys.pop(agent_id, None)
+        self._open_counts.pop(agent_id, None)
+
+    def _adjust(self, agent_id, delta):
+        if agent_id in self._open_counts:
+            self._open_counts[agent_id] += delta
+            self._push(agent_id)
+
+    def reload(self):
+        """Rebuild the heaps from the agents and the open lead counts.
+
+        The queries run outside the lock and the result only replaces the
+        current state if no change was applied while they ran, since such a
+        change may or may not be part of what they read. Returns whether a
+        load was installed.
+        """
+        for _ in range(RELOAD_ATTEMPTS):
+            with self._lock:
+                changes = self._changes
+            agents = db.session.query(User.id, User.service_areas, User.specializations) \
+                .filter(User.user_type == UserType.AGENT).all()
+            counts = dict(
+                db.session.query(Lead.assigned_agent_id, func.count())
+                .filter(Lead.status.in_(OPEN_LEAD_STATUSES), Lead.assigned_agent_id.isnot(None))
+                .group_by(Lead.assigned_agent_id).all()
+            )
+            open_counts = {agent_id: counts.get(agent_id, 0) for agent_id, _, _ in agents}
+            agent_keys = {agent_id: self._keys_for(service_areas, specializations)
+                          for agent_id, service_areas, specializations in agents}
+            with self._lock:
+                if self._changes != changes:
+                    continue
+                self._heaps, self._agent_keys, self._open_counts = {}, agent_keys, open_counts
+                for key in {key for keys in agent_keys.values() for key in keys}:
+                    self._rebuild(key)
+                self._loaded = True
+                return True
+        return False
+
+    def _ensure_loaded(self):
+        # Only the very first pick loads on the request path
+        if not self._loaded:
+            self.reload()
+
+    def pick_agent(self, desired_location=None, desired_property_type=None):
+        """Return the id of the agent a new lead should go to, or None without agents.
+
+        Agents serving the lead's area with a matching specialization are
+        preferred, then any agent serving the area, then specialists, then
+        everyone; ties go to the fewest open leads.
+        """
+        self._ensure_loaded()
+        areas = split_preferences(desired_location)
+        specialties = split_preferences(desired_property_type)
+        tiers = (
+            [("area_spec", a, s) for a in areas for s in specialties],
+            [("area", a) for a in areas],
+            [("spec", s) for s in specialties],
+            [ALL_AGENTS],
+        )
+        with self._lock:
+            for keys in tiers:
+                best = min(filter(None, (self._peek(key) for key in keys)), default=None)
+                if best is not None:
+                    return best[1]
+        return None
+
+    def open_lead_count(self, agent_id):
+        self._ensure_loaded()
+        return self._open_counts.get(agent_id, 0)
+
+    def apply_lead_change(self, action, values, previous):
+        with self._lock:
+            self._changes += 1
+            if not self._loaded:
+                return
+            before = after = None
+            if previous is not None and _is_open(previous.get("status")):
+                before = previous.get("assigned_agent_id")
+            if action != "delete" and _is_open(values.get("status")):
+                after = values.get("assigned_agent_id")
+            if before != after:
+                if before is not None:
+                    self._adjust(before, -1)
+                if after is not None:
+                    self._adjust(after, 1)
+
+    def apply_user_change(self, action, values):
+        with self._lock:
+            self._changes += 1
+            if not self._loaded:
+                return
+            agent_id = values.get("id")
+            if action == "delete" or not _is_agent(values.get("user_type")):
+                self._remove_agent(agent_id)
+            else:
+                self._set_agent(agent_id, values.get("service_areas"), values.get("specializations"))
+
+lead_assigner = LeadAssigner()
+subscribe(Lead, lead_assigner.apply_lead_change, previous=True)
+subscribe(User, lead_assigner.apply_user_change)
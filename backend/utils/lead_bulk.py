@@ -0,0 +1,132 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, update, case
+from modelsdb import db, Lead, LeadStatus
+from utils.change_tracking import publish
+from utils.lead_search import parse_lead_filters, apply_lead_filters, LEAD_FILTER_KEYS
+from utils.lead_stats import funnel_keys, apply_funnel_deltas
+from utils.validation import validate_lead_data
+
+MAX_BULK_LEADS = 10000
+
+# Fields a bulk change set may touch
+BULK_UPDATABLE_FIELDS = ["status", "assigned_agent_id", "source", "property_id", "notes"]
+
+def parse_bulk_request(data, identity):
+    """Validate a bulk body into (ids or None, filters or None, changes).
+
+    The body names the leads either by "ids" or by a "filter" object using
+    the same keys as the lead list query string. Raises ValueError with a
+    user-facing message on malformed input.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Body must be a JSON object")
+
+    changes = data.get("changes")
+    if not isinstance(changes, dict) or not changes:
+        raise ValueError("Changes must be a non-empty object")
+    unknown = sorted(set(changes) - set(BULK_UPDATABLE_FIELDS))
+    if unknown:
+        raise ValueError(f"Fields cannot be bulk updated: {', '.join(unknown)}")
+    is_valid, errors = validate_lead_data(changes)
+    if not is_valid:
+        raise ValueError("; ".join(errors))
+    if "status" in changes:
+        changes = dict(changes, status=LeadStatus(changes["status"]))
+
+    ids, filters = data.get("ids"), data.get("filter")
+    if (ids is None) == (filters is None):
+        raise ValueError("Provide either ids or filter")
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+            raise ValueError("Ids must be a non-empty list of integers")
+        if len(ids) > MAX_BULK_LEADS:
+            raise ValueError(f"At most {MAX_BULK_LEADS} leads can be updated at once")
+        return ids, None, changes
+    if not isinstance(filters, dict) or not filters:
+        raise ValueError("Filter must be a non-empty object")
+    unknown = sorted(set(filters) - set(LEAD_FILTER_KEYS))
+    if unknown:
+        raise ValueError(f"Unknown filter fields: {', '.join(unknown)}")
+    args = {k: ",".join(map(str, v)) if isinstance(v, list) else str(v) for k, v in filters.items()}
+    filters = parse_lead_filters(args, identity)
+    if not filters:
+        # An empty filter would match every lead
+        raise ValueError("Filter must restrict the leads to update")
+    return None, filters, changes
+
+def bulk_update_leads(ids, filters, changes):
+    """Apply one change set to many leads with a single UPDATE.
+
+    The funnel aggregates are adjusted in the same transaction, and the
+    committed rows are published to change subscribers afterwards, since
+    set-based statements skip the ORM flush hooks. The matched rows are
+    locked while they are read, so a concurrent writer cannot change a
+    status between the read and the UPDATE and skew the funnel deltas.
+    Returns a summary.
+    """
+    now = datetime.utcnow()
+    query = select(Lead.id, Lead.status, Lead.assigned_agent_id, Lead.source,
+                   Lead.status_changed_at, Lead.created_at)
+    if ids is not None:
+        query = query.where(Lead.id.in_(ids))
+    else:
+        query = apply_lead_filters(query, filters)
+    # Locks are taken in id order so overlapping bulk updates cannot deadlock
+    query = query.order_by(Lead.id).limit(MAX_BULK_LEADS + 1).with_for_update()
+    rows = db.session.execute(query).all()
+    if len(rows) > MAX_BULK_LEADS:
+        db.session.rollback()
+        raise ValueError(f"Filter matches more than {MAX_BULK_LEADS} leads; narrow it down")
+
+    deltas = defaultdict(int)
+    stage_exits = {}
+    published = []
+    previous = []
+    new_status = changes.get("status")
+    for row in rows:
+        old = (row.status, row.assigned_agent_id, row.source)
+        new = (changes.get("status", row.status), changes.get("assigned_agent_id", row.assigned_agent_id),
+               changes.get("source", row.source))
+        if old != new:
+            for key in funnel_keys(*old):
+                deltas[key] -= 1
+            for key in funnel_keys(*new):
+                deltas[key] += 1
+        if new_status is not None and row.status != new_status:
+            entered = row.status_changed_at or row.created_at or now
+            seconds, exits = stage_exits.get(row.status, (0.0, 0))
+            stage_exits[row.status] = (seconds + (now - entered).total_seconds(), exits + 1)
+        published.append({"id": row.id, "status": new[0], "assigned_agent_id": new[1], "source": new[2]})
+        previous.append({"id": row.id, "status": old[0], "assigned_agent_id": old[1], "source": old[2]})
+
+    matched_ids = [row.id for row in rows]
+    updated = 0
+    if matched_ids:
+        values = dict(changes, updated_at=now)
+        if new_status is not None:
+            values["status_changed_at"] = case(
+                (Lead.status != new_status, now), else_=Lead.status_changed_at
+            )
+        try:
+            result = db.session.execute(
+                update(Lead).where(Lead.id.in_(matched_ids)).values(values)
+                .execution_options(synchronize_session=False)
+            )
+            apply_funnel_deltas(db.session.connection(), deltas, stage_exits)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        updated = result.rowcount
+        publish(Lead, "update", published, previous)
+
+    summary = {
+        "matched": len(matched_ids),
+        "updated": updated,
+        "changes": {k: v.value if isinstance(v, LeadStatus) else v for k, v in changes.items()},
+    }
+    if ids is not None:
+        found = set(matched_ids)
+        summary["not_found"] = [i for i in ids if i not in found]
+    return summary
@@ -0,0 +1,230 @@
+from sqlalchemy import select, update, func, or_, bindparam
+from modelsdb import (db, Lead, LeadInteraction, Communication, OPEN_LEAD_STATUSES,
+                      normalize_location)
+from utils.matching import split_preferences
+
+# Pairs scoring at least this much are treated as the same request
+DUPLICATE_THRESHOLD = 0.8
+DEDUP_CHUNK_SIZE = 500
+
+# Weight of each requirement when comparing two leads of the same client;
+# requirements neither lead states are left out
+SIMILARITY_WEIGHTS = {
+    "property_id": 0.30,
+    "location_key": 0.25,
+    "desired_property_type": 0.15,
+    "budget": 0.15,
+    "desired_bedrooms": 0.10,
+    "desired_bathrooms": 0.05,
+}
+
+# Fields a merge copies from a duplicate when the surviving lead has none
+MERGE_FILL_FIELDS = [
+    "property_id", "assigned_agent_id", "source", "budget_min", "budget_max",
+    "preferred_contact", "preferred_contact_time", "desired_location",
+    "desired_property_type", "desired_bedrooms", "desired_bathrooms"
+]
+
+def _budget_overlap(a, b):
+    low_a, high_a = a.budget_min or 0.0, a.budget_max if a.budget_max is not None else float("inf")
+    low_b, high_b = b.budget_min or 0.0, b.budget_max if b.budget_max is not None else float("inf")
+    overlap = min(high_a, high_b) - max(low_a, low_b)
+    if overlap < 0:
+        return 0.0
+    union = max(high_a, high_b) - min(low_a, low_b)
+    return 1.0 if union in (0, float("inf")) else overlap / union
+
+def lead_similarity(a, b):
+    """Score in [0, 1] of how likely two leads of one client are the same request"""
+    if a.user_id != b.user_id:
+        return 0.0
+    total = weight_sum = 0.0
+    for field, weight in SIMILARITY_WEIGHTS.items():
+        if field == "budget":
+            if all(v is None for v in (a.budget_min, a.budget_max, b.budget_min, b.budget_max)):
+                continue
+            similarity = _budget_overlap(a, b)
+        elif field == "desired_property_type":
+            types_a = set(split_preferences(a.desired_property_type))
+            types_b = set(split_preferences(b.desired_property_type))
+            if not types_a and not types_b:
+                continue
+            similarity = len(types_a & types_b) / len(types_a | types_b)
+        else:
+            value_a, value_b = getattr(a, field), getattr(b, field)
+            if value_a is None and value_b is None:
+                continue
+            similarity = 1.0 if value_a == value_b else 0.0
+        total += weight * similarity
+        weight_sum += weight
+    return total / weight_sum if weight_sum else 1.0
+
+def find_duplicate(lead):
+    """Return the open lead a new, unsaved lead duplicates, or None.
+
+    Only leads sharing the client and either the property or the normalized
+    location are compared, via ix_leads_user_property/ix_leads_user_location_key.
+    """
+    blocks = []
+    if lead.property_id is not None:
+        blocks.append(Lead.property_id == lead.property_id)
+    lead.location_key = normalize_location(lead.desired_location)
+    if lead.location_key:
+        blocks.append(Lead.location_key == lead.location_key)
+    if not blocks:
+        return None
+
+    candidates = Lead.query.filter(
+        Lead.user_id == lead.user_id, Lead.status.in_(OPEN_LEAD_STATUSES), or_(*blocks)
+    ).order_by(Lead.created_at, Lead.id).limit(50).all()
+    best, best_score = None, DUPLICATE_THRESHOLD
+    for candidate in candidates:
+        score = lead_similarity(lead, candidate)
+        if score >= best_score:
+            best, best_score = candidate, score
+    return best
+
+def merge_lead_fields(survivor, duplicate):
+    """Fold a duplicate's details into the surviving lead (in the session)"""
+    for field in MERGE_FILL_FIELDS:
+        if getattr(survivor, field) is None and getattr(duplicate, field) is not None:
+            setattr(survivor, field, getattr(duplicate, field))
+    if duplicate.notes and duplicate.notes != survivor.notes:
+        survivor.notes = f"{survivor.notes}\n\n{duplicate.notes}" if survivor.notes else duplicate.notes
+    if duplicate.status in OPEN_LEAD_STATUSES and survivor.status in OPEN_LEAD_STATUSES \
+            and OPEN_LEAD_STATUSES.index(duplicate.status) > OPEN_LEAD_STATUSES.index(survivor.status):
+        survivor.status = duplicate.status  # Keep the furthest progress
+    if duplicate.last_contacted and (survivor.last_contacted is None
+                                     or duplicate.last_contacted > survivor.last_contacted):
+        survivor.last_contacted = duplicate.last_contacted
+
+def merge_leads(survivor, duplicates):
+    """Merge saved duplicates into survivor: children move over with one
+    UPDATE per table and the duplicate rows are deleted. Does not commit.
+    """
+    duplicate_ids = [d.id for d in duplicates]
+    for duplicate in duplicates:
+        merge_lead_fields(survivor, duplicate)
+    for child in (LeadInteraction, Communication):
+        db.session.execute(
+            update(child).where(child.lead_id.in_(duplicate_ids)).values(lead_id=survivor.id)
+            .execution_options(synchronize_session=False)
+        )
+    for duplicate in duplicates:
+        # The children were moved above; stop the delete from orphaning a stale copy
+        db.session.expire(duplicate, ["interactions", "communications"])
+        db.session.delete(duplicate)
+
+def _duplicate_blocks():
+    """(user_id, block column, value) for every block holding 2+ open leads"""
+    blocks = []
+    for column in (Lead.property_id, Lead.location_key):
+        rows = db.session.execute(
+            select(Lead.user_id, column)
+            .where(Lead.status.in_(OPEN_LEAD_STATUSES), column.isnot(None))
+            .group_by(Lead.user_id, column)
+            .having(func.count() > 1)
+        ).all()
+        blocks.extend((user_id, column, value) for user_id, value in rows)
+    return blocks
+
+# Columns lead_similarity reads; blocks are scored on these plain rows
+_SIMILARITY_COLUMNS = (
+    Lead.id, Lead.user_id, Lead.property_id, Lead.location_key, Lead.desired_property_type,
+    Lead.budget_min, Lead.budget_max, Lead.desired_bedrooms, Lead.desired_bathrooms, Lead.created_at,
+)
+
+def backfill_location_keys():
+    """Fill location_key for leads written before it was maintained"""
+    table = Lead.__table__
+    # Not an edit: updated_at stays as it is
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("lead_id"))
+        .values(location_key=bindparam("key"), updated_at=table.c.updated_at)
+    )
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Lead.id, Lead.desired_location)
+            .where(Lead.location_key.is_(None), Lead.desired_location.isnot(None), Lead.desired_location != "",
+                   Lead.id > last_id)
+            .order_by(Lead.id)
+            .limit(DEDUP_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        # Locations that normalize to nothing stay NULL; the id seek moves past them
+        keys = [(id, normalize_location(location)) for id, location in rows]
+        keys = [{"lead_id": id, "key": key} for id, key in keys if key]
+        if keys:
+            db.session.execute(statement, keys)
+            db.session.commit()
+
+def deduplicate_leads(dry_run=False):
+    """Find and merge duplicate open leads across the whole table.
+
+    Candidates are grouped into blocks by SQL, scored pairwise inside each
+    block, and connected duplicates merge into their oldest lead, one group
+    per transaction. A dry run writes nothing, so leads whose location key
+    was never filled in are only blocked by property. Returns a summary with
+    the merged groups as [survivor id, [duplicate ids]].
+    """
+    if not dry_run:
+        backfill_location_keys()
+
+    parent = {}
+    def find(lead_id):
+        while parent.setdefault(lead_id, lead_id) != lead_id:
+            parent[lead_id] = parent[parent[lead_id]]
+            lead_id = parent[lead_id]
+        return lead_id
+
+    created = {}
+    blocks = _duplicate_blocks()
+    for user_id, column, value in blocks:
+        members = db.session.execute(
+            select(*_SIMILARITY_COLUMNS)
+            .where(Lead.user_id == user_id, column == value, Lead.status.in_(OPEN_LEAD_STATUSES))
+            .order_by(Lead.created_at, Lead.id)
+        ).all()
+        created.update((lead.id, (lead.created_at, lead.id)) for lead in members)
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if lead_similarity(a, b) >= DUPLICATE_THRESHOLD:
+                    root_a, root_b = find(a.id), find(b.id)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b, key=created.get)] = min(root_a, root_b, key=created.get)
+
+    groups = {}
+    for lead_id in parent:
+        root = find(lead_id)
+        if root != lead_id:
+            groups.setdefault(root, []).append(lead_id)
+
+    merged = []
+    for survivor_id, duplicate_ids in sorted(groups.items()):
+        if dry_run:
+            merged.append([survivor_id, sorted(duplicate_ids)])
+            continue
+        survivor = db.session.get(Lead, survivor_id)
+        duplicates = Lead.query.filter(Lead.id.in_(duplicate_ids)).order_by(Lead.id).all()
+        if survivor is None or not duplicates:
+            continue  # Changed since the scan
+        try:
+            merge_leads(survivor, duplicates)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        merged.append([survivor_id, [d.id for d in duplicates]])
+        # Let merged leads go rather than holding every group in the session
+        db.session.expunge(survivor)
+
+    return {
+        "blocks": len(blocks),
+        "merged": sum(len(ids) for _, ids in merged),
+        "dry_run": dry_run,
+        "groups": merged,
+    }
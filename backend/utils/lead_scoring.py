@@ -0,0 +1,248 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import select, update, insert, func, bindparam, or_
+from sqlalchemy.exc import IntegrityError
+from modelsdb import db, Lead, LeadStatus, LeadInteraction, ScheduledRun, OPEN_LEAD_STATUSES
+from utils.change_tracking import subscribe
+from utils.matching import property_inventory
+
+logger = logging.getLogger(__name__)
+
+SCORE_BATCH_SIZE = 2000
+FULL_RESCORE_RUN = "lead_full_rescore"
+
+# Relative weight of each component of the 0-100 priority score
+SCORE_WEIGHTS = {
+    "budget_fit": 0.25,
+    "recency": 0.20,
+    "follow_up": 0.20,
+    "engagement": 0.15,
+    "status": 0.20,
+}
+STATUS_WEIGHTS = {
+    LeadStatus.NEW: 0.6,
+    LeadStatus.CONTACTED: 0.7,
+    LeadStatus.IN_PROGRESS: 0.85,
+    LeadStatus.QUALIFIED: 1.0,
+}
+RECENCY_DAYS = 30  # A lead this old has about a third of the recency score left
+FOLLOW_UP_DAYS = 7  # Time since last contact at which a follow-up is mostly due
+ENGAGEMENT_INTERACTIONS = 3
+BUDGET_FIT_LISTINGS = 50  # Listings within budget that count as a full fit
+
+def score_leads(rows, prices, now):
+    """Priority scores for a batch of open leads in one vectorized pass.
+
+    rows are (id, status, budget_min, budget_max, created_at,
+    last_contacted, interaction count) tuples and prices the sorted
+    active listing prices. Returns a float array aligned with rows.
+    """
+    _, statuses, budget_min, budget_max, created_at, last_contacted, interactions = zip(*rows)
+
+    low = np.array([0.0 if b is None else b for b in budget_min])
+    high = np.array([np.inf if b is None else b for b in budget_max])
+    within = np.searchsorted(prices, high, side="right") - np.searchsorted(prices, low, side="left")
+    budget_fit = np.clip(np.log1p(np.maximum(within, 0)) / np.log1p(BUDGET_FIT_LISTINGS), 0, 1)
+
+    age_days = np.array([(now - c).total_seconds() / 86400 if c else 0.0 for c in created_at])
+    recency = np.exp(-np.maximum(age_days, 0) / RECENCY_DAYS)
+
+    # Never contacted scores 1; otherwise the need grows with time since contact
+    since_contact = np.array([(now - c).total_seconds() / 86400 if c else np.inf for c in last_contacted])
+    follow_up = 1 - np.exp(-np.maximum(since_contact, 0) / FOLLOW_UP_DAYS)
+
+    engagement = 1 - np.exp(-np.array(interactions, dtype=float) / ENGAGEMENT_INTERACTIONS)
+    status = np.array([STATUS_WEIGHTS.get(s, 0.0) for s in statuses])
+
+    score = (SCORE_WEIGHTS["budget_fit"] * budget_fit + SCORE_WEIGHTS["recency"] * recency
+             + SCORE_WEIGHTS["follow_up"] * follow_up + SCORE_WEIGHTS["engagement"] * engagement
+             + SCORE_WEIGHTS["status"] * status)
+    return np.round(score * 100, 2)
+
+def _scoring_query(low_id, high_id):
+    """Scoring rows for the open leads with ids in [low_id, high_id]; the
+    interaction counts are grouped over that id range only.
+    """
+    interactions = (
+        select(LeadInteraction.lead_id, func.count().label("count"))
+        .where(LeadInteraction.lead_id.between(low_id, high_id))
+        .group_by(LeadInteraction.lead_id)
+        .subquery()
+    )
+    return (
+        select(Lead.id, Lead.status, Lead.budget_min, Lead.budget_max, Lead.created_at,
+               Lead.last_contacted, func.coalesce(interactions.c.count, 0))
+        .outerjoin(interactions, interactions.c.lead_id == Lead.id)
+        .where(Lead.status.in_(OPEN_LEAD_STATUSES), Lead.id.between(low_id, high_id))
+    )
+
+def _claim_run(name, interval):
+    """Record a run of a periodic job unless another process ran it within
+    interval seconds; True when this process should run it.
+    """
+    table = ScheduledRun.__table__
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        result = connection.execute(
+            update(table)
+            .where(table.c.name == name,
+                   or_(table.c.last_run_at.is_(None), table.c.last_run_at <= now - timedelta(seconds=interval)))
+            .values(last_run_at=now)
+        )
+        if result.rowcount:
+            return True
+        if connection.execute(select(table.c.name).where(table.c.name == name)).first():
+            return False
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(insert(table).values(name=name, last_run_at=now))
+        return True
+    except IntegrityError:
+        return False  # Another process made the first claim
+
+# Scoring is not an edit: updated_at keeps its value
+_SCORE_UPDATE = (
+    update(Lead.__table__)
+    .where(Lead.__table__.c.id == bindparam("lead_id"))
+    .values(priority_score=bindparam("score"), updated_at=Lead.__table__.c.updated_at)
+)
+_CLOSED_UPDATE = (
+    update(Lead.__table__)
+    .where(Lead.__table__.c.status.notin_(OPEN_LEAD_STATUSES),
+           Lead.__table__.c.priority_score != 0)
+    .values(priority_score=0, updated_at=Lead.__table__.c.updated_at)
+)
+
+class LeadScorer:
+    """Keeps Lead.priority_score current from a background thread.
+
+    Lead and interaction events only queue the lead id; the thread rescores
+    queued leads every flush interval and all open leads every full
+    interval, batch by batch with NumPy, so requests never compute scores.
+    Each worker flushes its own queue, but only the worker that claims the
+    full run in scheduled_runs rescores everything.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._app = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_full = 0.0
+
+    def init_app(self, app):
+        self._app = app
+        self.interval = app.config.get("LEAD_SCORE_FLUSH_INTERVAL", 10)
+        self.full_interval = app.config.get("LEAD_SCORE_FULL_INTERVAL", 3600)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lead-scoring", daemon=True)
+            self._thread.start()
+            atexit.register(self._stop.set)
+
+    def mark(self, lead_id):
+        with self._lock:
+            self._pending.add(lead_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if time.monotonic() - self._last_full >= self.full_interval:
+                self._last_full = time.monotonic()
+                if self._claim_full_rescore():
+                    self.rescore_all()
+                    continue
+            self.flush()
+
+    def _claim_full_rescore(self):
+        try:
+            with self._app.app_context():
+                return _claim_run(FULL_RESCORE_RUN, self.full_interval)
+        except Exception:
+            logger.exception("Claiming the full lead rescore failed")
+            return False
+
+    def _rescore(self, condition=None):
+        """Score the open leads matching condition one id range at a time,
+        writing and committing each batch before the next is read, so memory
+        and the interaction count stay at a batch however many leads are open.
+        """
+        now = datetime.utcnow()
+        prices = property_inventory.active_prices()
+        scored = 0
+        last_id = 0
+        while True:
+            ids = select(Lead.id).where(Lead.status.in_(OPEN_LEAD_STATUSES), Lead.id > last_id)
+            if condition is not None:
+                ids = ids.where(condition)
+            ids = db.session.scalars(ids.order_by(Lead.id).limit(SCORE_BATCH_SIZE)).all()
+            if not ids:
+                return scored
+            query = _scoring_query(ids[0], ids[-1])
+            if condition is not None:
+                query = query.where(condition)
+            batch = db.session.execute(query.order_by(Lead.id)).all()
+            if batch:
+                scores = score_leads(batch, prices, now)
+                db.session.execute(_SCORE_UPDATE, [
+                    {"lead_id": row[0], "score": float(score)} for row, score in zip(batch, scores)
+                ])
+                db.session.commit()
+            scored += len(batch)
+            last_id = ids[-1]
+
+    def rescore_all(self):
+        """Score every open lead and zero closed ones; returns leads scored"""
+        with self._lock:
+            self._pending.clear()
+        try:
+            with self._app.app_context():
+                scored = self._rescore()
+                db.session.execute(_CLOSED_UPDATE)
+                db.session.commit()
+                return scored
+        except Exception:
+            logger.exception("Scoring leads failed")
+            with self._app.app_context():
+                db.session.rollback()
+            return 0
+
+    def flush(self):
+        """Rescore the leads queued by events since the last run"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, set()
+
+        ids = list(pending)
+        try:
+            with self._app.app_context():
+                scored = 0
+                for start in range(0, len(ids), SCORE_BATCH_SIZE):
+                    chunk = ids[start:start + SCORE_BATCH_SIZE]
+                    scored += self._rescore(Lead.id.in_(chunk))
+                    db.session.execute(_CLOSED_UPDATE.where(Lead.__table__.c.id.in_(chunk)))
+                db.session.commit()
+                return scored
+        except Exception:
+            logger.exception("Rescoring leads failed, keeping them for the next run")
+            with self._app.app_context():
+                db.session.rollback()
+            with self._lock:
+                self._pending.update(pending)
+            return 0
+
+    def _on_lead_change(self, action, values):
+        if action != "delete":
+            self.mark(values.get("id"))
+
+    def _on_interaction_change(self, action, values):
+        if values.get("lead_id") is not None:
+            self.mark(values["lead_id"])
+
+lead_scorer = LeadScorer()
+subscribe(Lead, lead_scorer._on_lead_change)
+subscribe(LeadInteraction, lead_scorer._on_interaction_change)
@@ -0,0 +1,78 @@
+from datetime import datetime
+from modelsdb import Lead, LeadStatus
+from utils.property_search import _parse_number
+
+# Query parameters parse_lead_filters understands
+LEAD_FILTER_KEYS = ["status", "assigned_agent_id", "property_id", "source", "created_after", "created_before"]
+
+def _parse_datetime(args, name):
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name.replace('_', ' ').capitalize()} must be an ISO 8601 date")
+
+def parse_lead_filters(args, identity):
+    """Turn request query parameters into a dict of lead filters.
+
+    status takes one or more comma separated values and assigned_agent_id
+    also accepts "me" and "none" (unassigned). Raises ValueError with a
+    user-facing message on malformed input.
+    """
+    filters = {}
+
+    if args.get("status"):
+        try:
+            filters["status"] = [LeadStatus(s.strip()) for s in args["status"].split(",") if s.strip()]
+        except ValueError:
+            raise ValueError("Invalid status")
+
+    agent = args.get("assigned_agent_id")
+    if agent == "me":
+        filters["assigned_agent_id"] = identity["id"]
+    elif agent == "none":
+        filters["assigned_agent_id"] = None
+    else:
+        agent_id = _parse_number(args, "assigned_agent_id", int)
+        if agent_id is not None:
+            filters["assigned_agent_id"] = agent_id
+
+    property_id = _parse_number(args, "property_id", int)
+    if property_id is not None:
+        filters["property_id"] = property_id
+
+    if args.get("source"):
+        filters["source"] = args["source"].strip()
+
+    for name in ("created_after", "created_before"):
+        value = _parse_datetime(args, name)
+        if value is not None:
+            filters[name] = value
+
+    if "created_after" in filters and "created_before" in filters \
+            and filters["created_after"] > filters["created_before"]:
+        raise ValueError("Created after cannot be later than created before")
+
+    return filters
+
+def apply_lead_filters(query, filters):
+    """Add the WHERE clauses for parsed filters to a Lead query"""
+    if "status" in filters:
+        statuses = filters["status"]
+        if len(statuses) == 1:
+            query = query.filter(Lead.status == statuses[0])
+        else:
+            query = query.filter(Lead.status.in_(statuses))
+    if "assigned_agent_id" in filters:
+        query = query.filter(Lead.assigned_agent_id == filters["assigned_agent_id"])
+    if "property_id" in filters:
+        query = query.filter(Lead.property_id == filters["property_id"])
+    if "source" in filters:
+        query = query.filter(Lead.source == filters["source"])
+    if "created_after" in filters:
+        query = query.filter(Lead.created_at >= filters["created_after"])
+    if "created_before" in filters:
+        query = query.filter(Lead.created_at < filters["created_before"])
+    return query
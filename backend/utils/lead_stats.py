@@ -0,0 +1,174 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import event, inspect, select, func, delete, insert, update
+from sqlalchemy.orm import Session
+from modelsdb import db, Lead, LeadStatus, LeadFunnelCount, LeadStageDuration
+
+FUNNEL_FIELDS = ("status", "assigned_agent_id", "source")
+
+def _status_value(status):
+    return status.value if isinstance(status, LeadStatus) else status
+
+def funnel_keys(status, assigned_agent_id, source):
+    """Aggregate rows a lead with these values is counted in"""
+    status = _status_value(status)
+    return (
+        ("all", "", status),
+        ("agent", "" if assigned_agent_id is None else str(assigned_agent_id), status),
+        ("source", source or "", status),
+    )
+
+def _load_previous_on_set(target, value, oldvalue, initiator):
+    """No-op; registering it with active_history is what matters"""
+
+# Load the committed value before a funnel field is overwritten, so _previous
+# still sees it when the attribute was expired (e.g. by an earlier commit)
+for _field in FUNNEL_FIELDS + ("status_changed_at",):
+    event.listen(getattr(Lead, _field), "set", _load_previous_on_set, active_history=True)
+
+def _previous(obj, field):
+    history = inspect(obj).attrs[field].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(obj, field)
+
+def _upsert(connection, table, keys, values):
+    """INSERT rows, adding values onto the existing row when the key is taken"""
+    if not values:
+        return
+    # Touch rows in key order, so transactions moving leads between the same
+    # two statuses in opposite directions cannot deadlock on each other
+    values = sorted(values, key=lambda row: tuple(row[k] for k in keys))
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        for row in values:
+            changes = {c: table.c[c] + row[c] for c in row if c not in keys}
+            result = connection.execute(update(table).where(*(table.c[k] == row[k] for k in keys)).values(changes))
+            if result.rowcount == 0:
+                connection.execute(insert(table).values(row))
+        return
+    stmt = dialect_insert(table)
+    columns = [c for c in values[0] if c not in keys]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={c: table.c[c] + stmt.excluded[c] for c in columns},
+    )
+    connection.execute(stmt, values)
+
+def apply_funnel_deltas(connection, deltas, stage_exits=None):
+    """Add count deltas {(dimension, value, status): n} and stage exits
+    {status: (seconds, exits)} to the aggregate tables on connection.
+
+    Bulk statements that bypass the ORM call this themselves in the same
+    transaction; ORM flushes go through the session hooks below.
+    """
+    _upsert(connection, LeadFunnelCount.__table__, ("dimension", "dimension_value", "status"), [
+        {"dimension": d, "dimension_value": v, "status": s, "count": n}
+        for (d, v, s), n in deltas.items() if n
+    ])
+    _upsert(connection, LeadStageDuration.__table__, ("status",), [
+        {"status": _status_value(s), "total_seconds": seconds, "exits": exits}
+        for s, (seconds, exits) in (stage_exits or {}).items()
+    ])
+
+@event.listens_for(Session, "before_flush")
+def _stamp_status_changes(session, flush_context, instances):
+    now = datetime.utcnow()
+    for obj in session.new:
+        if isinstance(obj, Lead):
+            obj.status = obj.status or LeadStatus.NEW
+            obj.status_changed_at = obj.status_changed_at or now
+    for obj in session.dirty:
+        if isinstance(obj, Lead) and inspect(obj).attrs.status.history.has_changes():
+            if _status_value(_previous(obj, "status")) != _status_value(obj.status):
+                obj.status_changed_at = now
+
+@event.listens_for(Session, "after_flush")
+def _update_funnel(session, flush_context):
+    deltas = defaultdict(int)
+    stage_exits = {}
+    now = datetime.utcnow()
+
+    for obj in session.new:
+        if isinstance(obj, Lead):
+            for key in funnel_keys(obj.status, obj.assigned_agent_id, obj.source):
+                deltas[key] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Lead):
+            for key in funnel_keys(*(_previous(obj, f) for f in FUNNEL_FIELDS)):
+                deltas[key] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, Lead):
+            continue
+        old = tuple(_previous(obj, f) for f in FUNNEL_FIELDS)
+        new = tuple(getattr(obj, f) for f in FUNNEL_FIELDS)
+        if old == new:
+            continue
+        for key in funnel_keys(*old):
+            deltas[key] -= 1
+        for key in funnel_keys(*new):
+            deltas[key] += 1
+        if _status_value(old[0]) != _status_value(new[0]):
+            entered = _previous(obj, "status_changed_at") or obj.created_at or now
+            seconds, exits = stage_exits.get(old[0], (0.0, 0))
+            stage_exits[old[0]] = (seconds + (now - entered).total_seconds(), exits + 1)
+
+    if any(deltas.values()) or stage_exits:
+        apply_funnel_deltas(session.connection(), deltas, stage_exits)
+
+def rebuild_lead_stats():
+    """Recount the funnel from the leads table (backfill or repair).
+
+    Stage durations cannot be recovered from current rows and are kept.
+    """
+    rows = defaultdict(int)
+    grouped = db.session.execute(
+        select(Lead.status, Lead.assigned_agent_id, Lead.source, func.count())
+        .group_by(Lead.status, Lead.assigned_agent_id, Lead.source)
+    )
+    for status, agent_id, source, count in grouped:
+        for key in funnel_keys(status, agent_id, source):
+            rows[key] += count
+    db.session.execute(delete(LeadFunnelCount))
+    apply_funnel_deltas(db.session.connection(), rows)
+    db.session.commit()
+
+def backfill_lead_stats():
+    """Build the aggregates once for databases that predate them"""
+    if db.session.query(LeadFunnelCount.status).first() is None and db.session.query(Lead.id).first() is not None:
+        rebuild_lead_stats()
+
+def _summarize(counts):
+    total = sum(counts.values())
+    converted = counts.get(LeadStatus.CONVERTED.value, 0)
+    return {
+        "total": total,
+        "by_status": counts,
+        "conversion_rate": round(converted / total, 4) if total else 0.0,
+    }
+
+def lead_funnel_stats():
+    """Funnel counts, conversion rates and average time in stage, read from
+    the aggregate tables (size bounded by agents x sources x statuses).
+    """
+    grouped = defaultdict(lambda: defaultdict(dict))
+    for row in LeadFunnelCount.query.filter(LeadFunnelCount.count != 0):
+        grouped[row.dimension][row.dimension_value][row.status] = row.count
+
+    overall = _summarize(dict(grouped["all"].get("", {})))
+    return {
+        **overall,
+        "by_agent": {value or "unassigned": _summarize(dict(counts)) for value, counts in grouped["agent"].items()},
+        "by_source": {value or "unknown": _summarize(dict(counts)) for value, counts in grouped["source"].items()},
+        "time_in_stage": {
+            row.status: {
+                "average_hours": round(row.total_seconds / row.exits / 3600, 2) if row.exits else None,
+                "exits": row.exits,
+            }
+            for row in LeadStageDuration.query.all()
+        },
+    }
@@ -0,0 +1,240 @@
+import threading
+import time
+import numpy as np
+from modelsdb import db, Property, PropertyType
+from utils.change_tracking import subscribe
+from utils.table_versions import current_version, PROPERTIES
+
+# Relative weight of each criterion; only criteria a lead specifies count
+MATCH_WEIGHTS = {
+    "budget": 0.35,
+    "location": 0.30,
+    "property_type": 0.20,
+    "bedrooms": 0.10,
+    "bathrooms": 0.05,
+}
+# How far outside the budget (as a share of the budget) a price scores zero
+BUDGET_TOLERANCE = 0.25
+INITIAL_CAPACITY = 1024
+LOAD_ATTEMPTS = 3
+
+PROPERTY_TYPE_CODES = {t: code for code, t in enumerate(PropertyType)}
+
+def split_preferences(value):
+    """Split a free-text, comma separated preference into normalized terms"""
+    if not value:
+        return []
+    return [part.strip().lower() for part in value.split(",") if part.strip()]
+
+class PropertyInventory:
+    """Columnar NumPy copy of the active listings used for scoring.
+
+    One slot per property: prices, rooms and coded type/city/state live in
+    parallel arrays so a lead is scored against every listing at once.
+    Committed property changes update single slots in place; removed
+    listings leave a tombstone until enough pile up to compact. Other
+    workers' changes are picked up by a full reload once the properties
+    table version has moved, checked at most once per reload interval.
+    """
+
+    # Everything a load replaces
+    _STATE = ("_slots", "_places", "_size", "ids", "active", "price", "bedrooms", "bathrooms",
+              "property_type", "city", "state")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._version = None  # properties version the arrays were loaded at
+        self._checked_at = None  # time.monotonic() the version last matched
+        self._changes = 0  # Bumped by every applied change, to detect ones racing a load
+        self.reload_interval = 60
+        self._slots = {}  # property id -> slot index
+        self._places = {}  # lowercase city/state -> code
+        self._size = 0
+        self._allocate(INITIAL_CAPACITY)
+
+    def init_app(self, app):
+        self.reload_interval = app.config.get("PROPERTY_CACHE_RELOAD_INTERVAL", 60)
+
+    def _allocate(self, capacity):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.bedrooms = np.full(capacity, np.nan)
+        self.bathrooms = np.full(capacity, np.nan)
+        self.property_type = np.full(capacity, -1, dtype=np.int16)
+        self.city = np.full(capacity, -1, dtype=np.int32)
+        self.state = np.full(capacity, -1, dtype=np.int32)
+
+    def _grow(self):
+        old = (self.ids, self.active, self.price, self.bedrooms, self.bathrooms,
+               self.property_type, self.city, self.state)
+        self._allocate(len(self.ids) * 2)
+        new = (self.ids, self.active, self.price, self.bedrooms, self.bathrooms,
+               self.property_type, self.city, self.state)
+        for old_array, new_array in zip(old, new):
+            new_array[:self._size] = old_array[:self._size]
+
+    def _place_code(self, name):
+        if not name:
+            return -1
+        return self._places.setdefault(name.strip().lower(), len(self._places))
+
+    def _write(self, values):
+        property_id = values["id"]
+        slot = self._slots.get(property_id)
+        if values.get("status", "active") != "active":
+            if slot is not None:
+                self.active[slot] = False
+                del self._slots[property_id]
+            return
+        if slot is None:
+            if self._size == len(self.ids):
+                self._grow()
+            slot = self._size
+            self._size += 1
+            self._slots[property_id] = slot
+
+        property_type = values.get("property_type")
+        if isinstance(property_type, str):
+            property_type = PropertyType(property_type)
+        self.ids[slot] = property_id
+        self.active[slot] = True
+        self.price[slot] = values.get("price") or 0
+        self.bedrooms[slot] = np.nan if values.get("bedrooms") is None else values["bedrooms"]
+        self.bathrooms[slot] = np.nan if values.get("bathrooms") is None else values["bathrooms"]
+        self.property_type[slot] = PROPERTY_TYPE_CODES.get(property_type, -1)
+        self.city[slot] = self._place_code(values.get("city"))
+        self.state[slot] = self._place_code(values.get("state"))
+
+    def _compact(self):
+        live = np.flatnonzero(self.active[:self._size])
+        arrays = ("ids", "active", "price", "bedrooms", "bathrooms", "property_type", "city", "state")
+        for name in arrays:
+            array = getattr(self, name)
+            array[:len(live)] = array[live]
+        self._size = len(live)
+        self.active[self._size:] = False
+        self._slots = {int(pid): slot for slot, pid in enumerate(self.ids[:self._size])}
+
+    def _is_current(self):
+        if not self._loaded:
+            return False
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+            return True
+        if current_version(PROPERTIES)[0] != self._version:
+            return False
+        self._checked_at = now
+        return True
+
+    def _load(self):
+        columns = (Property.id, Property.status, Property.price, Property.bedrooms,
+                   Property.bathrooms, Property.property_type, Property.city, Property.state)
+        fresh = PropertyInventory()
+        for row in db.session.query(*columns).filter(Property.status == "active"):
+            fresh._write(dict(row._mapping))
+        return fresh
+
+    def _install(self, fresh, version):
+        for name in self._STATE:
+            setattr(self, name, getattr(fresh, name))
+        self._loaded = True
+        self._version = version
+        self._checked_at = time.monotonic() if version is not None else None
+
+    def _ensure_loaded(self):
+        if self._is_current():
+            return
+        # The arrays are built off to the side, outside the lock
+        for _ in range(LOAD_ATTEMPTS):
+            with self._lock:
+                changes = self._changes
+            # Read the version first: a write landing after it only causes
+            # one more reload, never a missed one
+            version = current_version(PROPERTIES)[0]
+            fresh = self._load()
+            with self._lock:
+                # A change applied mid-load may be missing from fresh
+                if self._changes == changes:
+                    self._install(fresh, version)
+                    return
+        with self._lock:
+            # Kept racing changes: serve what is loaded, or else the last
+            # load until the next use reloads it
+            if not self._loaded:
+                self._install(fresh, None)
+
+    def apply_change(self, action, values):
+        with self._lock:
+            self._changes += 1
+            if not self._loaded:
+                return
+            if action == "delete":
+                values = {"id": values.get("id"), "status": "deleted"}
+            self._write(values)
+            if self._size > INITIAL_CAPACITY and len(self._slots) < self._size // 2:
+                self._compact()
+
+    def score_lead(self, lead):
+        """Score every active listing against a lead; returns (ids, scores)"""
+        self._ensure_loaded()
+        with self._lock:
+            n = self._size
+            active = self.active[:n]
+            total = np.zeros(n)
+            weight_sum = 0.0
+
+            if lead.budget_min is not None or lead.budget_max is not None:
+                price = self.price[:n]
+                low = lead.budget_min or 0.0
+                high = lead.budget_max if lead.budget_max is not None else np.inf
+                distance = np.maximum(low - price, 0) + np.maximum(price - high, 0)
+                scale = BUDGET_TOLERANCE * (high if np.isfinite(high) else max(low, 1.0))
+                total += MATCH_WEIGHTS["budget"] * np.clip(1 - distance / max(scale, 1.0), 0, 1)
+                weight_sum += MATCH_WEIGHTS["budget"]
+
+            places = [self._places[p] for p in split_preferences(lead.desired_location) if p in self._places]
+            if lead.desired_location:
+                if places:
+                    matched = np.isin(self.city[:n], places) | np.isin(self.state[:n], places)
+                    total += MATCH_WEIGHTS["location"] * matched
+                weight_sum += MATCH_WEIGHTS["location"]
+
+            if lead.desired_property_type:
+                codes = [PROPERTY_TYPE_CODES[PropertyType(t)] for t in split_preferences(lead.desired_property_type)
+                         if t in PropertyType._value2member_map_]
+                if codes:
+                    total += MATCH_WEIGHTS["property_type"] * np.isin(self.property_type[:n], codes)
+                weight_sum += MATCH_WEIGHTS["property_type"]
+
+            for field, wanted in (("bedrooms", lead.desired_bedrooms), ("bathrooms", lead.desired_bathrooms)):
+                if wanted:
+                    rooms = getattr(self, field)[:n]
+                    # Enough rooms scores 1, fewer scores the share available;
+                    # unknown counts score half
+                    fit = np.where(np.isnan(rooms), 0.5, np.clip(rooms / wanted, 0, 1))
+                    total += MATCH_WEIGHTS[field] * fit
+                    weight_sum += MATCH_WEIGHTS[field]
+
+            scores = total / weight_sum if weight_sum else np.full(n, 1.0)
+            scores = np.where(active, scores, 0.0)
+            return self.ids[:n].copy(), scores
+
+    def active_prices(self):
+        """Sorted prices of every active listing"""
+        self._ensure_loaded()
+        with self._lock:
+            return np.sort(self.price[:self._size][self.active[:self._size]])
+
+    def top_matches(self, lead, k):
+        """Return [(property_id, score)] for the k best scoring listings, best first"""
+        ids, scores = self.score_lead(lead)
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in ordered]
+
+property_inventory = PropertyInventory()
+subscribe(Property, property_inventory.apply_change)
@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse the limit query parameter and clamp it to [1, maximum]"""
+    if value is None or value == "":
+        return default
+    try:
+        limit = int(value)
+    except (ValueError, TypeError):
+        raise ValueError("Limit must be a valid number")
+    return max(1, min(limit, maximum))
+
+def encode_cursor(created_at, id):
+    """Encode a (created_at, id) position as an opaque cursor string"""
+    raw = json.dumps([created_at.isoformat(), id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor back into (created_at, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+def paginate_keyset(query, model, limit, cursor=None):
+    """Return one page of query ordered newest first, plus the cursor for the next page.
+
+    Pages seek on (created_at, id) instead of using OFFSET, so the cost of a
+    page only depends on its size, not on how deep into the result set it is.
+    """
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, last_id))
+
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+def paginate_by_score(query, model, column, limit, cursor=None):
+    """Like paginate_keyset, but ordered by a numeric column, highest first,
+    seeking on (column, id) with a rank cursor.
+    """
+    if cursor:
+        score, last_id = decode_rank_cursor(cursor)
+        query = query.filter(tuple_(column, model.id) < tuple_(score, last_id))
+
+    rows = query.order_by(column.desc(), model.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_rank_cursor(getattr(rows[-1], column.key), rows[-1].id)
+    return rows, next_cursor
+
+def encode_rank_cursor(score, id):
+    """Encode a (relevance score, id) position for ranked result pages"""
+    raw = json.dumps([score, id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_rank_cursor(cursor):
+    """Decode a cursor produced by encode_rank_cursor back into (score, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return float(score), int(id)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import insert
+from modelsdb import db, Property, PropertyType
+from utils.change_tracking import publish
+from utils.table_versions import bump_versions, PROPERTIES
+from utils.geo import encode_geohash
+from utils.validation import validate_property_data, normalize_property_data
+
+IMPORT_CHUNK_SIZE = 500
+MAX_IMPORT_ROWS = 10000
+
+# Columns written for every imported row; executemany needs the same keys
+# in every parameter set
+IMPORT_FIELDS = [
+    "title", "description", "price", "address", "city", "state", "zip_code",
+    "latitude", "longitude", "bedrooms", "bathrooms", "square_feet", "lot_size",
+    "year_built", "parking_spaces", "features", "amenities"
+]
+
+def read_import_rows(request):
+    """Return the list of row dicts from a JSON array body or a CSV upload"""
+    upload = request.files.get("file")
+    if upload is not None:
+        text = io.TextIOWrapper(upload.stream, encoding="utf-8-sig")
+        rows = list(csv.DictReader(text))
+    elif request.content_type and "text/csv" in request.content_type:
+        rows = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("Body must be a JSON array of properties or a CSV file")
+
+    if not rows:
+        raise ValueError("No rows to import")
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise ValueError(f"At most {MAX_IMPORT_ROWS} rows can be imported at once")
+    return rows
+
+def _prepare_row(row, agent_id, now):
+    # CSV gives empty strings for blank cells; treat them as missing
+    data = normalize_property_data({k: v for k, v in row.items() if k and v not in ("", None)})
+    is_valid, errors = validate_property_data(data)
+    if not is_valid:
+        return None, errors
+
+    values = {field: data.get(field) for field in IMPORT_FIELDS}
+    for field in ("features", "amenities"):
+        if values[field] is not None and not isinstance(values[field], str):
+            values[field] = json.dumps(values[field])
+    values.update(
+        property_type=PropertyType(data["property_type"]),
+        status=data.get("status", "active"),
+        is_featured=data.get("is_featured", False),
+        view_count=0,
+        favorite_count=0,
+        agent_id=agent_id,
+        created_at=now,
+        updated_at=now,
+        # Bulk inserts skip mapper events, so the spatial key is set here
+        geohash=encode_geohash(values["latitude"], values["longitude"])
+        if values["latitude"] is not None and values["longitude"] is not None else None
+    )
+    return values, None
+
+def import_properties(rows, agent_id):
+    """Validate rows and insert the valid ones in chunked transactions.
+
+    Returns a summary with the new ids and per-row errors (row numbers are
+    1-based positions in the upload).
+    """
+    now = datetime.utcnow()
+    errors = []
+    valid = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            values, row_errors = _prepare_row(row, agent_id, now)
+        except (AttributeError, TypeError, ValueError) as e:
+            # Wrong value types (e.g. a number where text is expected) fail
+            # this row only; the rest of the upload still imports
+            values, row_errors = None, [f"Invalid row: {e}"]
+        if row_errors:
+            errors.append({"row": number, "errors": row_errors})
+        else:
+            valid.append((number, values))
+
+    created_ids = []
+    statement = insert(Property).returning(Property.id, sort_by_parameter_order=True)
+    for start in range(0, len(valid), IMPORT_CHUNK_SIZE):
+        chunk = valid[start:start + IMPORT_CHUNK_SIZE]
+        params = [values for _, values in chunk]
+        try:
+            ids = db.session.scalars(statement, params).all()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            errors.extend({"row": number, "errors": [str(e)]} for number, _ in chunk)
+            continue
+        bump_versions([PROPERTIES])
+        created_ids.extend(ids)
+        publish(Property, "insert", [dict(values, id=id) for id, values in zip(ids, params)])
+
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "total": len(rows),
+        "created": len(created_ids),
+        "failed": len(errors),
+        "ids": created_ids,
+        "errors": errors
+    }
@@ -0,0 +1,89 @@
+from modelsdb import Property, PropertyType
+from utils.geo import parse_bbox, bbox_clause
+
+VALID_STATUSES = ['active', 'pending', 'sold', 'withdrawn']
+
+def _parse_number(args, name, cast=float):
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return cast(value)
+    except (ValueError, TypeError):
+        raise ValueError(f"{name.replace('_', ' ').capitalize()} must be a valid number")
+
+def _parse_bool(args, name):
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    value = value.lower()
+    if value in ("true", "1", "yes"):
+        return True
+    if value in ("false", "0", "no"):
+        return False
+    raise ValueError(f"{name.replace('_', ' ').capitalize()} must be true or false")
+
+def parse_property_filters(args):
+    """Turn request query parameters into a dict of property filters.
+
+    Raises ValueError with a user-facing message on malformed input.
+    """
+    filters = {}
+
+    for field in ("city", "state"):
+        if args.get(field):
+            filters[field] = args[field].strip()
+
+    if args.get("property_type"):
+        try:
+            filters["property_type"] = PropertyType(args["property_type"])
+        except ValueError:
+            raise ValueError("Invalid property type")
+
+    if args.get("status"):
+        if args["status"] not in VALID_STATUSES:
+            raise ValueError("Invalid status")
+        filters["status"] = args["status"]
+
+    is_featured = _parse_bool(args, "is_featured")
+    if is_featured is not None:
+        filters["is_featured"] = is_featured
+
+    for name, cast in (("min_price", float), ("max_price", float),
+                       ("min_bedrooms", int), ("min_bathrooms", float)):
+        value = _parse_number(args, name, cast)
+        if value is not None:
+            filters[name] = value
+
+    if args.get("bbox"):
+        filters["bbox"] = parse_bbox(args["bbox"])
+
+    if filters.get("min_price") is not None and filters.get("max_price") is not None \
+            and filters["min_price"] > filters["max_price"]:
+        raise ValueError("Minimum price cannot be greater than maximum price")
+
+    return filters
+
+def apply_property_filters(query, filters):
+    """Add the WHERE clauses for parsed filters to a Property query"""
+    if "city" in filters:
+        query = query.filter(Property.city == filters["city"])
+    if "state" in filters:
+        query = query.filter(Property.state == filters["state"])
+    if "property_type" in filters:
+        query = query.filter(Property.property_type == filters["property_type"])
+    if "status" in filters:
+        query = query.filter(Property.status == filters["status"])
+    if "is_featured" in filters:
+        query = query.filter(Property.is_featured == filters["is_featured"])
+    if "min_price" in filters:
+        query = query.filter(Property.price >= filters["min_price"])
+    if "max_price" in filters:
+        query = query.filter(Property.price <= filters["max_price"])
+    if "min_bedrooms" in filters:
+        query = query.filter(Property.bedrooms >= filters["min_bedrooms"])
+    if "min_bathrooms" in filters:
+        query = query.filter(Property.bathrooms >= filters["min_bathrooms"])
+    if "bbox" in filters:
+        query = query.filter(bbox_clause(Property, filters["bbox"]))
+    return query
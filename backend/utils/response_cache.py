@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import Response
+from config import Config
+from modelsdb import Property, PropertyImage
+from utils.change_tracking import subscribe
+from utils.http_cache import with_cache_headers
+
+LIST_TAG = "properties"
+
+def property_tag(property_id):
+    return f"property:{property_id}"
+
+class ResponseCache:
+    """Bounded LRU of serialized responses with a TTL per entry.
+
+    Entries carry tags so a write can drop every response that may contain
+    the changed row without scanning the whole cache.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}  # tag -> set of keys
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, tags):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+response_cache = ResponseCache(Config.RESPONSE_CACHE_MAX_ENTRIES, Config.RESPONSE_CACHE_TTL)
+
+def store_response(key, result, tags):
+    """Cache a successful (response, status) pair from the response helpers and pass it through"""
+    response, status_code = result
+    if status_code == 200:
+        etag, _ = response.get_etag()
+        response_cache.set(key, (response.get_data(), etag, response.last_modified), tags)
+    return result
+
+def replay_response(cached):
+    """Rebuild a (response, status) pair from a cached entry"""
+    body, etag, last_modified = cached
+    return with_cache_headers((Response(body, mimetype="application/json"), 200), etag, last_modified)
+
+# Drop cached responses once a change to a property or its images commits.
+# Lists are dropped on any change since a row can enter or leave any page.
+def _invalidate_property(action, values):
+    response_cache.invalidate(property_tag(values.get("id")), LIST_TAG)
+
+def _invalidate_property_image(action, values):
+    response_cache.invalidate(property_tag(values.get("property_id")), LIST_TAG)
+
+subscribe(Property, _invalidate_property)
+subscribe(PropertyImage, _invalidate_property_image)
@@ -1,19 +1,24 @@
 from flask import jsonify
 
-def success_response(data=None, message=None, status_code=200):
+def success_response(data=None, message=None, status_code=200, **extra):
     response = {
         "status": "success",
         "data": data
     }
     if message:
         response["message"] = message
+    # Extra top-level envelope keys (e.g. next_cursor for paginated lists)
+    response.update(extra)
     return jsonify(response), status_code
 
-def error_response(error, message=None, status_code=400):
+def error_response(error, message=None, status_code=400, details=None):
     response = {
         "status": "error",
         "error": error
     }
     if message:
         response["message"] = message
+    # Extra top-level envelope keys (e.g. validation_errors)
+    if details:
+        response.update(details)
     return jsonify(response), status_code
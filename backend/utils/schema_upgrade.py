@@ -0,0 +1,72 @@
+from sqlalchemy import inspect, literal, text, update, func
+from modelsdb import db, Property, PropertyImage, Lead, LeadInteraction, PROPERTY_SEARCH_INDEX
+from utils.lead_dedup import backfill_location_keys
+
+# Models whose indexes are created on tables that predate them
+INDEXED_MODELS = (Property, PropertyImage, Lead, LeadInteraction)
+
+def add_missing_columns(model):
+    """ALTER TABLE ADD COLUMN for model columns the table does not have yet;
+    returns the names added.
+
+    db.create_all() only creates missing tables, never missing columns. NOT
+    NULL columns get their scalar default as the server default, so existing
+    rows have a value.
+    """
+    table = model.__table__
+    existing = {column["name"] for column in inspect(db.engine).get_columns(table.name)}
+    missing = [column for column in table.columns if column.name not in existing]
+    if not missing:
+        return []
+    dialect = db.engine.dialect
+    quote = dialect.identifier_preparer.quote
+    with db.engine.begin() as connection:
+        for column in missing:
+            ddl = f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(dialect=dialect)}"
+            if not column.nullable:
+                default = literal(column.default.arg, column.type).compile(
+                    dialect=dialect, compile_kwargs={"literal_binds": True}
+                )
+                ddl += f" DEFAULT {default} NOT NULL"
+            connection.execute(text(ddl))
+    return [column.name for column in missing]
+
+def create_missing_indexes(model):
+    """Create the model's indexes that the table does not have yet"""
+    with db.engine.begin() as connection:
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+def upgrade_schema():
+    """Bring tables created by older versions up to the current models.
+
+    Idempotent; runs at startup after db.create_all() and from the
+    upgrade-db command.
+    """
+    add_missing_columns(Property)
+    if "processing_status" in add_missing_columns(PropertyImage):
+        # Images stored before the pipeline existed are served as uploaded
+        db.session.execute(
+            update(PropertyImage).where(PropertyImage.processing_status.is_(None)).values(processing_status="skipped")
+        )
+        db.session.commit()
+
+    # priority_score gets DEFAULT 0 from its model default; the scorer fills
+    # it in on its next full run
+    add_missing_columns(Lead)
+    leads = Lead.__table__
+    # Time in stage counts from the last write for leads older than the column
+    db.session.execute(
+        update(leads).where(leads.c.status_changed_at.is_(None))
+        .values(status_changed_at=func.coalesce(leads.c.updated_at, leads.c.created_at),
+                updated_at=leads.c.updated_at)
+    )
+    db.session.commit()
+    backfill_location_keys()
+
+    for model in INDEXED_MODELS:
+        create_missing_indexes(model)
+    if db.engine.dialect.name == "postgresql":
+        # Expression index, outside the model's Index list (see modelsdb)
+        with db.engine.begin() as connection:
+            connection.execute(text(PROPERTY_SEARCH_INDEX))
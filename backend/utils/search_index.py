@@ -0,0 +1,163 @@
+import math
+import re
+import threading
+from collections import defaultdict
+from sqlalchemy import Float, cast, func, literal_column, and_, or_
+from modelsdb import db, Property, PROPERTY_SEARCH_VECTOR
+from utils.change_tracking import subscribe
+from utils.pagination import encode_rank_cursor, decode_rank_cursor
+
+TS_CONFIG = "english"
+SEARCH_BATCH_SIZE = 500
+
+# Field weights for the in-process index, mirroring the A/B/C tsvector weights
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "address": 2.0,
+    "features": 2.0,
+    "amenities": 2.0,
+    "description": 1.0,
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "the", "to", "with"
+}
+
+def tokenize(text):
+    """Split text into lowercase search terms"""
+    if not text:
+        return []
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if (len(t) > 1 or t.isdigit()) and t not in STOPWORDS]
+
+class SearchIndex:
+    """In-process inverted index over property text, used when the database
+    has no native full-text search (e.g. SQLite during local runs).
+
+    Postings map each term to {property_id: weighted term frequency}. The
+    index is built on first search and then kept current from committed
+    property changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None  # term -> {property_id: weight}
+        self._documents = {}  # property_id -> set of terms, for removal
+
+    def _document_terms(self, values):
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(values.get(field)):
+                weights[term] += weight
+        return weights
+
+    def _add(self, property_id, values):
+        weights = self._document_terms(values)
+        for term, weight in weights.items():
+            self._postings[term][property_id] = weight
+        self._documents[property_id] = set(weights)
+
+    def _remove(self, property_id):
+        for term in self._documents.pop(property_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(property_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _ensure_built(self):
+        if self._postings is not None:
+            return
+        columns = [Property.id] + [getattr(Property, field) for field in FIELD_WEIGHTS]
+        rows = db.session.query(*columns).yield_per(1000)
+        with self._lock:
+            if self._postings is not None:
+                return
+            self._postings = defaultdict(dict)
+            for row in rows:
+                self._add(row[0], dict(zip(FIELD_WEIGHTS, row[1:])))
+
+    def search(self, q):
+        """Return {property_id: score} for properties containing every term of q"""
+        self._ensure_built()
+        terms = set(tokenize(q))
+        if not terms:
+            return {}
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in terms]
+            if not all(postings):
+                return {}
+            total = len(self._documents)
+            postings.sort(key=len)
+            scores = {}
+            for property_id in postings[0]:
+                score = 0.0
+                for term_postings in postings:
+                    weight = term_postings.get(property_id)
+                    if weight is None:
+                        break
+                    score += weight * math.log(1 + total / len(term_postings))
+                else:
+                    scores[property_id] = score
+            return scores
+
+    def apply_change(self, action, values):
+        with self._lock:
+            if self._postings is None:
+                return
+            self._remove(values.get("id"))
+            if action != "delete":
+                self._add(values.get("id"), values)
+
+search_index = SearchIndex()
+subscribe(Property, search_index.apply_change)
+
+def _uses_postgres():
+    return db.session.get_bind().dialect.name == "postgresql"
+
+def match_clause(q):
+    """SQL condition selecting the properties that match q"""
+    if _uses_postgres():
+        vector = literal_column(f"({PROPERTY_SEARCH_VECTOR})")
+        return vector.op("@@")(func.websearch_to_tsquery(TS_CONFIG, q))
+    return Property.id.in_(list(search_index.search(q)))
+
+def search_properties(query, q, limit, cursor=None):
+    """Return one page of a Property query matching q, best match first, plus
+    the cursor for the next page.
+
+    Pages seek on (score, id), so they stay stable while paging just like the
+    default (created_at, id) ordering.
+    """
+    after = decode_rank_cursor(cursor) if cursor else None
+
+    if _uses_postgres():
+        vector = literal_column(f"({PROPERTY_SEARCH_VECTOR})")
+        ts_query = func.websearch_to_tsquery(TS_CONFIG, q)
+        # ts_rank_cd returns float4 while the cursor comes back as float8;
+        # compare at double precision so ties on the page boundary match
+        rank = cast(func.ts_rank_cd(vector, ts_query), Float(53))
+        query = query.filter(match_clause(q))
+        if after:
+            query = query.filter(or_(rank < after[0], and_(rank == after[0], Property.id < after[1])))
+        rows = query.add_columns(rank).order_by(rank.desc(), Property.id.desc()).limit(limit + 1).all()
+        ranked = [(prop, float(score)) for prop, score in rows]
+    else:
+        scores = search_index.search(q)
+        ordered = sorted(scores, key=lambda i: (scores[i], i), reverse=True)
+        if after:
+            ordered = [i for i in ordered if (scores[i], i) < after]
+        # Let the database apply the other filters, a batch of candidates at a time
+        ranked = []
+        for start in range(0, len(ordered), SEARCH_BATCH_SIZE):
+            batch = ordered[start:start + SEARCH_BATCH_SIZE]
+            found = {p.id: p for p in query.filter(Property.id.in_(batch)).all()}
+            ranked.extend((found[i], scores[i]) for i in batch if i in found)
+            if len(ranked) > limit:
+                break
+
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        next_cursor = encode_rank_cursor(ranked[-1][1], ranked[-1][0].id)
+    return [prop for prop, _ in ranked], next_cursor
@@ -0,0 +1,75 @@
+import logging
+from datetime import datetime
+from sqlalchemy import event, update, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from modelsdb import db, Property, PropertyImage, TableVersion
+
+logger = logging.getLogger(__name__)
+
+PROPERTIES = "properties"
+
+# Models whose writes change what the property endpoints return
+_TRACKED = {Property: PROPERTIES, PropertyImage: PROPERTIES}
+
+def bump_version(connection, name):
+    """Advance a table's version on connection, inside its current transaction"""
+    table = TableVersion.__table__
+    now = datetime.utcnow()
+    result = connection.execute(
+        update(table).where(table.c.name == name).values(version=table.c.version + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(table).values(name=name, version=1, updated_at=now))
+        except IntegrityError:
+            # Another transaction created the row first
+            connection.execute(
+                update(table).where(table.c.name == name).values(version=table.c.version + 1, updated_at=now)
+            )
+
+def bump_versions(names):
+    """Advance the versions of tables whose writes were just committed.
+
+    Each bump runs in its own short transaction, after the data is committed:
+    bumping inside the writer's transaction would hold the row lock on the
+    counter until commit and serialize every writer of the table. ORM commits
+    bump automatically; bulk statements that bypass the unit of work (imports)
+    call this after committing.
+    """
+    for name in sorted(names):
+        try:
+            with db.engine.begin() as connection:
+                bump_version(connection, name)
+        except Exception:
+            logger.exception("Bumping the %s version failed", name)
+
+def current_version(name):
+    """(version, last write time) of a table; (0, None) before its first write"""
+    row = db.session.query(TableVersion.version, TableVersion.updated_at) \
+        .filter(TableVersion.name == name).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_tables(session, flush_context):
+    names = session.info.setdefault("written_tables", set())
+    for obj in session.new:
+        if type(obj) in _TRACKED:
+            names.add(_TRACKED[type(obj)])
+    for obj in session.deleted:
+        if type(obj) in _TRACKED:
+            names.add(_TRACKED[type(obj)])
+    for obj in session.dirty:
+        if type(obj) in _TRACKED and session.is_modified(obj, include_collections=False):
+            names.add(_TRACKED[type(obj)])
+
+@event.listens_for(Session, "after_commit")
+def _bump_written_tables(session):
+    names = session.info.pop("written_tables", None)
+    if names:
+        bump_versions(names)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_tables(session):
+    session.info.pop("written_tables", None)
@@ -0,0 +1,68 @@
+import os
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
+from werkzeug.utils import secure_filename
+from utils.image_storage import StreamedUpload
+
+MAX_FORM_FIELDS_SIZE = 512 * 1024  # Non-file form fields, kept in memory
+
+class _DiscardedPart:
+    """Write target for parts that will not be stored (wrong field or file type)"""
+
+    def write(self, data):
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        return 0
+
+    def close(self):
+        pass
+
+def parse_image_upload(request, field, allowed_extensions, max_files, max_file_size):
+    """Parse a multipart request, streaming the image parts in field to disk.
+
+    Returns (form data dict, list of StreamedUpload). Limits are enforced while
+    the body is read: the declared Content-Length is checked before reading
+    anything, and each file part is cut off as soon as it grows too large.
+    Raises RequestEntityTooLarge on any limit; partial files are removed.
+    """
+    max_request_size = max_files * max_file_size + MAX_FORM_FIELDS_SIZE
+    if request.content_length is not None and request.content_length > max_request_size:
+        raise RequestEntityTooLarge(f"Uploads are limited to {max_files} images per request")
+
+    uploads = []
+
+    def stream_factory(total_content_length=None, content_type=None, filename=None, content_length=None):
+        _, ext = os.path.splitext(secure_filename(filename or ""))
+        if ext[1:].lower() not in allowed_extensions:
+            return _DiscardedPart()
+        if len(uploads) >= max_files:
+            raise RequestEntityTooLarge(f"At most {max_files} images can be uploaded at once")
+        if content_length and content_length > max_file_size:
+            raise RequestEntityTooLarge(f"Each image must be at most {max_file_size // (1024 * 1024)}MB")
+        upload = StreamedUpload(ext, max_file_size)
+        uploads.append(upload)
+        return upload
+
+    try:
+        _, form, files = parse_form_data(
+            request.environ,
+            stream_factory=stream_factory,
+            max_form_memory_size=MAX_FORM_FIELDS_SIZE,
+            max_content_length=max_request_size,
+        )
+    except RequestEntityTooLarge:
+        for upload in uploads:
+            upload.discard()
+        raise
+
+    # Keep only parts of the expected field, in upload order
+    wanted = {id(f.stream) for f in files.getlist(field)}
+    accepted = []
+    for upload in uploads:
+        if id(upload) in wanted:
+            upload.close()
+            accepted.append(upload)
+        else:
+            upload.discard()
+    return form.to_dict(), accepted
@@ -180,6 +180,26 @@ def validate_property_data(data):
     
     return len(errors) == 0, errors
 
+def normalize_property_data(data):
+    """Convert string values (form fields, CSV cells) to the types the property columns expect"""
+    numeric_fields = ['price', 'latitude', 'longitude', 'bedrooms', 'bathrooms', 
+                     'square_feet', 'lot_size', 'year_built', 'parking_spaces']
+    for field in numeric_fields:
+        if field in data and data[field]:
+            try:
+                if field in ['bedrooms', 'year_built', 'parking_spaces']:
+                    data[field] = int(data[field])
+                else:
+                    data[field] = float(data[field])
+            except (ValueError, TypeError):
+                data[field] = None
+    
+    # Convert boolean fields
+    if 'is_featured' in data:
+        data['is_featured'] = data['is_featured'].lower() == 'true' if isinstance(data['is_featured'], str) else bool(data['is_featured'])
+    
+    return data
+
 def validate_lead_data(data):
     """Validate lead creation/update data"""
     errors = []
@@ -5,8 +5,10 @@ export default function PropertyCard({ property }) {
   const getPrimaryImageUrl = () => {
     if (property?.images && property.images.length > 0) {
       const primaryImage = property.images.find(img => img.is_primary) || property.images[0];
+      // Prefer the small thumbnail once the image pipeline has made it
+      const imageUrl = primaryImage.thumbnail_url || primaryImage.image_url;
       // Construct full URL for image
-      return `http://localhost:5000${primaryImage.image_url}`;
+      return `http://localhost:5000${imageUrl}`;
     }
     return null;
   };
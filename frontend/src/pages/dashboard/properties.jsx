@@ -9,15 +9,18 @@ export default function Properties() {
   const [properties, setProperties] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
   const [fetchingProperties, setFetchingProperties] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
 
   // Fetch properties on component mount
   useEffect(() => {
     fetchProperties();
   }, []);
 
-  const fetchProperties = async () => {
+  const fetchProperties = async (cursor = null) => {
     try {
-      setFetchingProperties(true);
+      if (!cursor) {
+        setFetchingProperties(true);
+      }
       console.log('Fetching properties from API...');
       
       // Try with token first, but also allow without token since GET /properties is public
@@ -30,7 +33,11 @@ export default function Properties() {
         headers['Authorization'] = `Bearer ${token}`;
       }
       
-      const response = await fetch('http://localhost:5000/api/properties/', {
+      // Cards only need a handful of fields
+      const url = cursor
+        ? `http://localhost:5000/api/properties/?view=card&cursor=${encodeURIComponent(cursor)}`
+        : 'http://localhost:5000/api/properties/?view=card';
+      const response = await fetch(url, {
         method: 'GET',
         headers: headers
       });
@@ -42,8 +49,10 @@ export default function Properties() {
         console.log('API Response data:', result);
         
         if (result.status === 'success') {
-          setProperties(result.data || []);
-          console.log('Properties set:', result.data || []);
+          const page = result.data || [];
+          setProperties(prev => (cursor ? [...prev, ...page] : page));
+          setNextCursor(result.next_cursor || null);
+          console.log('Properties set:', page);
         } else {
           console.error('Failed to fetch properties:', result.message);
           alert(`Failed to fetch properties: ${result.message}`);
@@ -251,6 +260,17 @@ export default function Properties() {
           </div>
         )}
       </div>
+
+      {!fetchingProperties && nextCursor && (
+        <div className="flex justify-center mt-6 lg:mt-8">
+          <button
+            onClick={() => fetchProperties(nextCursor)}
+            className="px-6 py-3 bg-[#001B48] text-white rounded-lg hover:bg-[#002B6D] transition-colors font-medium"
+          >
+            Load More
+          </button>
+        </div>
+      )}
     </div>
   );
 }